@@ -0,0 +1,275 @@
+import math
+import random
+from collections.abc import Mapping
+
+import numpy as np
+
+# Maps up to this many cells get the whole CSR built in one vectorized pass
+# on first use; larger maps fill rows lazily as the search reaches them.
+FULL_BUILD_CELLS = 1 << 18
+
+
+def teleport_cost_quadratic(s_from, s_to):
+    """
+    Teleportation cost based on squared Euclidean distance.
+    """
+    dx = s_to[0] - s_from[0]
+    dy = s_to[1] - s_from[1]
+    distance = math.sqrt(dx ** 2 + dy ** 2)
+    distance = distance * random.uniform(.5, 1.3)  # added noise
+    rounded_distance = round(distance, 2)
+    return rounded_distance
+
+
+def teleport_cost_lower_bound(s_from, s_to, euclidean_cost=True):
+    """
+    Smallest cost `teleport_cost_quadratic` can draw for this pair, so it
+    holds for every Env instance of a map whatever noise it drew.
+    """
+    if not euclidean_cost:
+        return 1.0
+    dx = s_to[0] - s_from[0]
+    dy = s_to[1] - s_from[1]
+    return round(math.sqrt(dx ** 2 + dy ** 2) * .5, 2)
+
+
+def step_cost(dx, dy, euclidean_cost=True):
+    """Cost of one grid move: 1.0 straight, 1.4 diagonal (1.0 for unit cost)."""
+    if euclidean_cost and dx != 0 and dy != 0:
+        return 1.4
+    return 1.0
+
+
+class AdjacencyCache:
+    """
+    Per-Env adjacency store in CSR form for one cost mode.
+
+    Row `i` (flat cell index) lives in `neighbors[row_start[i]:row_end[i]]`
+    with matching float32 entries in `costs`; `row_start[i] == -1` means the
+    row has not been built yet. Neighbors are stored in `Env.motions` order
+    followed by the teleport exit, exactly like `get_neighbors`.
+
+    Teleport costs are drawn once per directed pair and then reused by every
+    agent on the map, so all agents see the same graph.
+    """
+
+    def __init__(self, environment, euclidean_cost=True, full_build_cells=FULL_BUILD_CELLS):
+        self.env = environment
+        self.euclidean_cost = euclidean_cost
+        self.full_build_cells = full_build_cells
+
+        n = self.env.n_cells
+        self.row_start = np.full(n, -1, dtype=np.int64)
+        self.row_end = np.full(n, -1, dtype=np.int64)
+        self.neighbors = np.empty(0, dtype=np.int32)
+        self.costs = np.empty(0, dtype=np.float32)
+        self.size = 0
+        self.stale = 0
+        self.built = False
+        self.teleport_costs = {}
+        self.view = NeighborCosts(self)
+
+        self.env.add_listener(self.invalidate)
+
+    def teleport_cost(self, s_from, s_to):
+        """Cost of the teleport edge s_from -> s_to, drawn once per pair."""
+        if not self.euclidean_cost:
+            return 1.0
+        key = (s_from, s_to)
+        if key not in self.teleport_costs:
+            self.teleport_costs[key] = teleport_cost_quadratic(s_from, s_to)
+        return self.teleport_costs[key]
+
+    def row(self, idx):
+        """(neighbor indices, costs) arrays of flat cell `idx`."""
+        if self.row_start[idx] < 0:
+            if not self.built and self.env.n_cells <= self.full_build_cells:
+                self.build()
+            else:
+                self._fill_row(idx)
+        a, b = self.row_start[idx], self.row_end[idx]
+        return self.neighbors[a:b], self.costs[a:b]
+
+    def _reserve(self, extra):
+        need = self.size + extra
+        if need > len(self.neighbors):
+            cap = max(need, 2 * len(self.neighbors), 1024)
+            neighbors = np.empty(cap, dtype=np.int32)
+            costs = np.empty(cap, dtype=np.float32)
+            neighbors[:self.size] = self.neighbors[:self.size]
+            costs[:self.size] = self.costs[:self.size]
+            self.neighbors, self.costs = neighbors, costs
+
+    def _fill_row(self, idx):
+        env = self.env
+        x, y = env.to_cell(idx)
+        x_range, y_range = env.x_range, env.y_range
+        cells = env.cells
+        nbrs = []
+        costs = []
+        if not cells[idx]:
+            for dx, dy in env.motions:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < x_range and 0 <= ny < y_range:
+                    j = nx * y_range + ny
+                    if not cells[j]:
+                        nbrs.append(j)
+                        costs.append(step_cost(dx, dy, self.euclidean_cost))
+            exit_cell = env.teleports.get((x, y))
+            if exit_cell is not None:
+                nbrs.append(env.to_index(exit_cell))
+                costs.append(self.teleport_cost((x, y), exit_cell))
+
+        self._reserve(len(nbrs))
+        a = self.size
+        self.neighbors[a:a + len(nbrs)] = nbrs
+        self.costs[a:a + len(nbrs)] = costs
+        self.size += len(nbrs)
+        self.row_start[idx] = a
+        self.row_end[idx] = self.size
+
+    def _motion_masks(self):
+        """Yield (motion, mask of cells whose move along it stays on free cells)."""
+        env = self.env
+        X, Y = env.x_range, env.y_range
+        free = env.grid == 0
+        for dx, dy in env.motions:
+            src = (slice(max(0, -dx), X - max(0, dx)), slice(max(0, -dy), Y - max(0, dy)))
+            dst = (slice(max(0, dx), X - max(0, -dx)), slice(max(0, dy), Y - max(0, -dy)))
+            ok = np.zeros((X, Y), dtype=bool)
+            ok[src] = free[src] & free[dst]
+            yield (dx, dy), ok
+
+    def build(self):
+        """Build every row at once with vectorized NumPy shifts."""
+        env = self.env
+        n = env.n_cells
+
+        teleport_rows = []
+        for a, b in env.teleports.items():
+            ia = env.to_index(a)
+            if 0 <= ia < n and not env.cells[ia]:
+                teleport_rows.append((ia, env.to_index(b), self.teleport_cost(a, b)))
+
+        counts = np.zeros(n, dtype=np.int64)
+        for _, ok in self._motion_masks():
+            counts += ok.ravel()
+        for ia, _, _ in teleport_rows:
+            counts[ia] += 1
+
+        row_end = np.cumsum(counts)
+        row_start = row_end - counts
+        total = int(row_end[-1]) if n else 0
+        neighbors = np.empty(total, dtype=np.int32)
+        costs = np.empty(total, dtype=np.float32)
+
+        fill = row_start.copy()
+        flat = np.arange(n, dtype=np.int64)
+        for (dx, dy), ok in self._motion_masks():
+            sel = flat[ok.ravel()]
+            pos = fill[sel]
+            neighbors[pos] = sel + (dx * env.y_range + dy)
+            costs[pos] = step_cost(dx, dy, self.euclidean_cost)
+            fill[sel] += 1
+        for ia, ib, c in teleport_rows:
+            neighbors[fill[ia]] = ib
+            costs[fill[ia]] = c
+            fill[ia] += 1
+
+        self.neighbors, self.costs = neighbors, costs
+        self.row_start, self.row_end = row_start, row_end
+        self.size = total
+        self.stale = 0
+        self.built = True
+        self.view.rows.clear()
+
+    def arrays(self):
+        """The CSR arrays of a full build, e.g. to share with other processes."""
+        if not self.built:
+            self.build()
+        return {
+            "row_start": self.row_start,
+            "row_end": self.row_end,
+            "neighbors": self.neighbors,
+            "costs": self.costs,
+        }
+
+    def load_arrays(self, arrays, teleport_costs):
+        """Adopt CSR arrays and teleport costs built elsewhere for the same map."""
+        self.row_start = arrays["row_start"]
+        self.row_end = arrays["row_end"]
+        self.neighbors = arrays["neighbors"]
+        self.costs = arrays["costs"]
+        self.size = len(self.neighbors)
+        self.stale = 0
+        self.built = True
+        self.teleport_costs = dict(teleport_costs)
+        self.view.rows.clear()
+
+    def invalidate(self, changed):
+        """Drop the rows affected by edits to the given cells."""
+        env = self.env
+        for s in changed:
+            x, y = s
+            for dx, dy in [(0, 0)] + env.motions:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < env.x_range and 0 <= ny < env.y_range:
+                    j = nx * env.y_range + ny
+                    if self.row_start[j] >= 0:
+                        self.stale += int(self.row_end[j] - self.row_start[j])
+                        self.row_start[j] = self.row_end[j] = -1
+                    self.view.rows.pop((nx, ny), None)
+            exit_cell = env.teleports.get(s)
+            if exit_cell is None:
+                for key in [k for k in self.teleport_costs if s in k]:
+                    del self.teleport_costs[key]
+
+        self.built = False
+        if self.stale > self.size // 2:
+            # Mostly garbage: start over and let rows refill on demand.
+            self.row_start[:] = -1
+            self.row_end[:] = -1
+            self.size = 0
+            self.stale = 0
+            self.view.rows.clear()
+
+
+class NeighborCosts(Mapping):
+    """
+    `NEIGHBOR_COSTS[s][s_next]` view over an AdjacencyCache.
+
+    Rows are turned into small dicts the first time a cell is looked up, so
+    only cells a search actually touches ever get materialized.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.rows = {}
+
+    def __getitem__(self, s):
+        row = self.rows.get(s)
+        if row is None:
+            env = self.cache.env
+            x, y = s
+            if not (0 <= x < env.x_range and 0 <= y < env.y_range) or env.cells[x * env.y_range + y]:
+                raise KeyError(s)
+            nbrs, costs = self.cache.row(x * env.y_range + y)
+            y_range = env.y_range
+            row = {
+                divmod(j, y_range): round(c, 2)
+                for j, c in zip(nbrs.tolist(), costs.tolist())
+            }
+            self.rows[s] = row
+        return row
+
+    def __contains__(self, s):
+        env = self.cache.env
+        x, y = s
+        return 0 <= x < env.x_range and 0 <= y < env.y_range and not env.cells[x * env.y_range + y]
+
+    def __iter__(self):
+        xs, ys = np.nonzero(self.cache.env.grid == 0)
+        return zip(xs.tolist(), ys.tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(self.cache.env.grid == 0))
@@ -1,14 +1,63 @@
-import math
-import random
+import heapq
+import time
 from abc import ABC, abstractmethod
 
+from adjacency import step_cost, teleport_cost_quadratic
+
+
+class SearchStats:
+    """
+    Counters and phase timers of one instrumented search.
+
+    `on_expand(s, stats)` is called after every node expansion.
+    """
+
+    def __init__(self, on_expand=None):
+        self.expansions = 0
+        self.heap_pushes = 0
+        self.heap_pops = 0
+        self.stale_pops = 0
+        self.neighbor_generations = 0
+        self.teleport_uses = 0
+        self.peak_open = 0
+        self.timers = {"preprocessing": 0.0, "search": 0.0, "extract_path": 0.0}
+        self.on_expand = on_expand
+
+    def expand(self, s, open_size=None):
+        self.expansions += 1
+        if open_size is not None and open_size > self.peak_open:
+            self.peak_open = open_size
+        if self.on_expand is not None:
+            self.on_expand(s, self)
+
+    def as_dict(self):
+        return {
+            "expansions": self.expansions,
+            "heap_pushes": self.heap_pushes,
+            "heap_pops": self.heap_pops,
+            "stale_pops": self.stale_pops,
+            "neighbor_generations": self.neighbor_generations,
+            "teleport_uses": self.teleport_uses,
+            "peak_open": self.peak_open,
+            "timers": dict(self.timers),
+        }
+
+    def __repr__(self):
+        return f"SearchStats({self.as_dict()})"
+
 
 class AbstractSearchAgent(ABC):
     """
     Abstract base class for an agent that can do path planning using search trees.
     """
 
+    # Set by `enable_stats`; searches only touch it behind an `is not None` check.
+    stats = None
+    heappush = staticmethod(heapq.heappush)
+    heappop = staticmethod(heapq.heappop)
+
     def __init__(self, s_start, s_goal, environment, euclidean_cost=True):
+        self.created = time.perf_counter()
         self.s_start = s_start
         self.s_goal = s_goal
         self.Env = environment
@@ -20,6 +69,7 @@ class AbstractSearchAgent(ABC):
         self.euclidean_cost = euclidean_cost
         self.teleport_cost = self.teleport_cost_quadratic
         self.NEIGHBOR_COSTS = self.precompute_neighbor_costs()  # use this attribute for your agents
+        self.ADJACENCY = self.Env.adjacency(euclidean_cost)  # CSR form of the same graph
 
         self.PARENT = {}
         self.COST = {}
@@ -29,16 +79,76 @@ class AbstractSearchAgent(ABC):
     def searching(self):
         pass
 
+    def enable_stats(self, on_expand=None):
+        """
+        Turn on instrumentation for this agent and return its SearchStats.
+
+        Heap operations, neighbor generation and extract_path are swapped
+        for counting/timing wrappers on this instance only, so agents that
+        never enable stats run the plain functions.
+        """
+        stats = self.stats = SearchStats(on_expand)
+        stats.timers["preprocessing"] = time.perf_counter() - self.created
+        push, pop = self.heappush, self.heappop
+        get_neighbors, extract_path = self.get_neighbors, self.extract_path
+        teleports = self.teleports
+
+        def heappush(heap, item):
+            stats.heap_pushes += 1
+            push(heap, item)
+            if len(heap) > stats.peak_open:
+                stats.peak_open = len(heap)
+
+        def heappop(heap):
+            stats.heap_pops += 1
+            return pop(heap)
+
+        def counted_neighbors(s):
+            neighbors = get_neighbors(s)
+            stats.neighbor_generations += len(neighbors)
+            if s in teleports:
+                stats.teleport_uses += 1
+            return neighbors
+
+        def timed_extract_path(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return extract_path(*args, **kwargs)
+            finally:
+                stats.timers["extract_path"] += time.perf_counter() - t0
+
+        self.heappush, self.heappop = heappush, heappop
+        self.get_neighbors, self.extract_path = counted_neighbors, timed_extract_path
+        return stats
+
+    def run(self, *args, on_expand=None, **kwargs):
+        """
+        `searching()` with instrumentation on; returns (path, visited, stats).
+
+        The preprocessing timer covers the agent's construction (up to the
+        first `enable_stats`/`run` call), the search timer the search
+        itself without extract_path.
+        """
+        stats = self.stats if self.stats is not None else self.enable_stats(on_expand)
+        t0 = time.perf_counter()
+        extract_before = stats.timers["extract_path"]
+        path, visited = self.searching(*args, **kwargs)
+        elapsed = time.perf_counter() - t0
+        stats.timers["search"] += elapsed - (stats.timers["extract_path"] - extract_before)
+        return path, visited, stats
+
     def get_neighbors(self, s):
         """
         Returns valid neighbors for normal movement + teleporter exit.
         """
         neighbors = []
+        x_range, y_range = self.Env.x_range, self.Env.y_range
+        cells = self.Env.cells
         # 8-direction movement
         for dx, dy in self.u_set:
             nx, ny = s[0] + dx, s[1] + dy
-            if 0 <= nx < self.Env.x_range and 0 <= ny < self.Env.y_range:
-                if (nx, ny) not in self.obs:
+            if 0 <= nx < x_range and 0 <= ny < y_range:
+                if not cells[nx * y_range + ny]:
                     neighbors.append((nx, ny))
 
         # If s is a teleport entrance, also add the exit location
@@ -48,16 +158,41 @@ class AbstractSearchAgent(ABC):
 
         return neighbors
 
+    def successors(self, s):
+        """
+        Cells s has an edge to: its neighbors if s is free, none if it is an
+        obstacle (a teleport may exit onto one, but nothing leaves it).
+        """
+        if s not in self.NEIGHBOR_COSTS:
+            return []
+        return self.get_neighbors(s)
+
+    def reverse_teleports(self):
+        """
+        Teleport entrances keyed by their exit.
+        """
+        sources = {}
+        for a, b in self.teleports.items():
+            sources.setdefault(b, []).append(a)
+        return sources
+
+    def predecessors(self, s):
+        """
+        Cells with an edge into s: its free grid neighbors plus the free
+        teleport entrances exiting at s. Uses the TELEPORT_SOURCES map from
+        reverse_teleports(), which the caller builds once per search.
+        """
+        preds = [u for u in self.get_neighbors(s) if u in self.NEIGHBOR_COSTS and s in self.NEIGHBOR_COSTS[u]]
+        for u in self.TELEPORT_SOURCES.get(s, ()):
+            if u not in preds and u in self.NEIGHBOR_COSTS and s in self.NEIGHBOR_COSTS[u]:
+                preds.append(u)
+        return preds
+
     def teleport_cost_quadratic(self, s_from, s_to):
         """
         Teleportation cost based on squared Euclidean distance.
         """
-        dx = s_to[0] - s_from[0]
-        dy = s_to[1] - s_from[1]
-        distance = math.sqrt(dx ** 2 + dy ** 2)
-        distance = distance * random.uniform(.5, 1.3)  # added noise
-        rounded_distance = round(distance, 2)
-        return rounded_distance
+        return teleport_cost_quadratic(s_from, s_to)
 
     def get_cost(self, s_from, s_to):
         """
@@ -72,35 +207,19 @@ class AbstractSearchAgent(ABC):
             return 1.0
 
         if s_from in self.teleports and self.teleports[s_from] == s_to:
-            return self.teleport_cost(s_from, s_to)
+            return self.ADJACENCY.teleport_cost(s_from, s_to)
 
-        dx = abs(s_to[0] - s_from[0])
-        dy = abs(s_to[1] - s_from[1])
-        if dx == 1 and dy == 1:
-            return 1.4
-        return 1.0
+        return step_cost(s_to[0] - s_from[0], s_to[1] - s_from[1])
 
     def precompute_neighbor_costs(self):
         """
-        For each cell, compute the cost to all its neighbors (including teleport exits).
-        """
-        neighbor_costs = {}
-
-        for x in range(self.Env.x_range):
-            for y in range(self.Env.y_range):
-                s = (x, y)
-                if s in self.obs:
-                    continue
+        Cost to all neighbors of each cell (including teleport exits).
 
-                neighbors = self.get_neighbors(s)
-                cost_map = {}
-
-                for s_next in neighbors:
-                    cost_map[s_next] = self.get_cost(s, s_next)
-
-                neighbor_costs[s] = cost_map
-
-        return neighbor_costs
+        The costs come from the Env's shared adjacency cache, so they are
+        computed once per map and cost mode and only for cells a search
+        actually reaches.
+        """
+        return self.Env.neighbor_costs(self.euclidean_cost)
 
     def extract_path(self):
         """
@@ -114,3 +233,14 @@ class AbstractSearchAgent(ABC):
         path.append(self.s_start)
         path.reverse()
         return path
+
+    def fill_path(self, path):
+        """
+        Reset PARENT and COST to the given start-to-goal path and return it.
+        """
+        self.PARENT = {self.s_start: self.s_start}
+        self.COST = {self.s_start: 0}
+        for a, b in zip(path, path[1:]):
+            self.PARENT[b] = a
+            self.COST[b] = self.COST[a] + round(self.NEIGHBOR_COSTS[a][b], 2)
+        return path
@@ -0,0 +1,155 @@
+import heapq
+import math
+import time
+from collections import namedtuple
+
+from agent import AbstractSearchAgent
+from heuristics import teleport_heuristic
+
+Solution = namedtuple("Solution", ["path", "cost", "bound", "elapsed", "expansions"])
+
+
+class ARAStarAgent(AbstractSearchAgent):
+    """
+    Anytime Repairing A*.
+
+    Starts as weighted A* with an inflated heuristic weight, which finds a
+    path quickly, then lowers the weight by `weight_step` towards 1 and
+    repairs the search: OPEN, the g-values and the cells that became
+    inconsistent are reused instead of starting over. Every improved path is
+    recorded in `solutions` (and passed to `on_solution`) together with its
+    suboptimality bound, i.e. its cost is at most `bound` times optimal.
+
+    The search stops at `time_budget` seconds or `max_expansions`
+    expansions, whichever comes first, and returns the best path so far.
+    `weight` stays the starting weight, so searching again starts over from
+    it; VISITED holds every cell expanded in any pass.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, weight=3.0, weight_step=0.5,
+                 time_budget=None, max_expansions=None, on_solution=None):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.weight = weight
+        self.weight_step = weight_step
+        self.time_budget = time_budget
+        self.max_expansions = max_expansions
+        self.on_solution = on_solution
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+        self.solutions = []
+
+    def get_h(self, s_from, s_to):
+        return self.heuristic.estimate(s_from, s_to)
+
+    def fvalue(self, s, g, weight):
+        return g + weight * self.h_goal(s)
+
+    def out_of_budget(self):
+        if self.max_expansions is not None and len(self.seened) >= self.max_expansions:
+            return True
+        if self.time_budget is not None and time.perf_counter() - self.t0 >= self.time_budget:
+            return True
+        return False
+
+    def improve_path(self, weight):
+        """Weighted A* pass; returns False if the budget ran out first."""
+        g = self.g
+        goal = self.s_goal
+        stats = self.stats
+        heappush, heappop = self.heappush, self.heappop
+        while self.open:
+            f, s = self.open[0]
+            if self.open_keys.get(s) != f:
+                heappop(self.open)
+                if stats is not None:
+                    stats.stale_pops += 1
+                continue
+            if self.fvalue(goal, g.get(goal, math.inf), weight) <= f:
+                return True
+            if self.out_of_budget():
+                return False
+            heappop(self.open)
+            del self.open_keys[s]
+            self.closed.add(s)
+            self.seened.append(s)
+            if stats is not None:
+                stats.expand(s, len(self.open))
+            for s_next in self.get_neighbors(s):
+                g_next = g[s] + round(self.NEIGHBOR_COSTS[s][s_next], 2)
+                if g_next < g.get(s_next, math.inf):
+                    g[s_next] = g_next
+                    self.parent[s_next] = s
+                    if s_next in self.closed:
+                        self.incons.add(s_next)
+                    else:
+                        f_next = self.fvalue(s_next, g_next, weight)
+                        self.open_keys[s_next] = f_next
+                        heappush(self.open, (f_next, s_next))
+        return True
+
+    def publish(self, weight, finished=True):
+        """
+        Record the current path to the goal if it is cheaper or better
+        bounded. The pass's weight only bounds the path of a finished pass.
+        """
+        if self.g.get(self.s_goal, math.inf) == math.inf:
+            return
+        path = [self.s_goal]
+        while path[-1] != self.s_start:
+            path.append(self.parent[path[-1]])
+        path.reverse()
+        cost = 0
+        for a, b in zip(path, path[1:]):
+            cost += round(self.NEIGHBOR_COSTS[a][b], 2)
+
+        floor = min(
+            [self.g[s] + self.h_goal(s) for s in list(self.open_keys) + list(self.incons)],
+            default=cost,
+        )
+        bound = cost / floor if floor > 0 else math.inf
+        if finished:
+            bound = min(weight, bound)
+        bound = max(1.0, bound)
+        if self.solutions and cost >= self.solutions[-1].cost and bound >= self.solutions[-1].bound:
+            return
+        solution = Solution(path, cost, bound, time.perf_counter() - self.t0, len(self.seened))
+        self.solutions.append(solution)
+        if self.on_solution is not None:
+            self.on_solution(solution)
+
+    def searching(self):
+        self.t0 = time.perf_counter()
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)  # rebuilt if the map was edited
+        self.h_goal = self.heuristic.toward(self.s_goal)
+        self.g = {self.s_start: 0}
+        self.parent = {self.s_start: self.s_start}
+        self.closed = set()
+        self.incons = set()
+        self.seened = []
+        self.VISITED = set()
+        weight = self.weight
+        f = self.fvalue(self.s_start, 0, weight)
+        self.open = [(f, self.s_start)]
+        self.open_keys = {self.s_start: f}
+
+        while True:
+            finished = self.improve_path(weight)
+            self.publish(weight, finished)
+            self.VISITED |= self.closed
+            if not finished or weight <= 1:
+                break
+            weight = max(1.0, weight - self.weight_step)
+            for s in self.incons:
+                self.open_keys[s] = None
+            self.incons = set()
+            self.open_keys = {s: self.fvalue(s, self.g[s], weight) for s in self.open_keys}
+            self.open = [(f, s) for s, f in self.open_keys.items()]
+            heapq.heapify(self.open)
+            self.closed = set()
+
+        return self.extract_path(), self.seened
+
+    def extract_path(self):
+        """Best published path, with PARENT and COST filled along it."""
+        if not self.solutions:
+            raise KeyError(self.s_goal)
+        return self.fill_path(self.solutions[-1].path)
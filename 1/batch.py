@@ -0,0 +1,71 @@
+import math
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sharedmap import attach_map, share_map
+
+PlanResult = namedtuple("PlanResult", ["start", "goal", "path", "cost", "expansions", "wall_time"])
+
+_worker = {}
+
+
+def _init_worker(map_spec, adjacency_specs, agent_class, euclidean_cost):
+    blocks = []
+    environment = attach_map(map_spec, adjacency_specs, euclidean_cost, blocks)
+    _worker.update(
+        env=environment,
+        blocks=blocks,
+        agent_class=agent_class,
+        euclidean_cost=euclidean_cost,
+    )
+
+
+def _plan_chunk(queries):
+    results = []
+    for start, goal in queries:
+        agent = _worker["agent_class"](start, goal, _worker["env"], _worker["euclidean_cost"])
+        t0 = time.perf_counter()
+        try:
+            path, visited = agent.searching()
+            cost = agent.COST[goal]
+        except KeyError:
+            path, visited, cost = None, agent.VISITED, math.inf
+        results.append(PlanResult(start, goal, path, cost, len(visited), time.perf_counter() - t0))
+    return results
+
+
+def plan_batch(environment, agent_class, queries, euclidean_cost=True, max_workers=None, chunksize=16):
+    """
+    Answer many (start, goal) queries on one map with a process pool.
+
+    The occupancy grid and the fully built adjacency arrays are placed in
+    shared memory once and every worker maps them, so nothing map-sized is
+    pickled per task. Teleport costs are drawn once here, so every query
+    sees the same graph. Yields a PlanResult per query in completion order;
+    unreachable goals come back with path None and cost inf.
+    """
+    queries = list(queries)
+    if not queries:
+        return
+    max_workers = max_workers or os.cpu_count() or 1
+
+    blocks = []
+    try:
+        map_spec, adjacency_specs = share_map(environment, euclidean_cost, blocks)
+        with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(map_spec, adjacency_specs, agent_class, euclidean_cost),
+        ) as pool:
+            futures = [
+                pool.submit(_plan_chunk, queries[i:i + chunksize])
+                for i in range(0, len(queries), chunksize)
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,274 @@
+import argparse
+import glob
+import inspect
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import implemented_agents
+from agent import AbstractSearchAgent
+from env import Env, maps_path
+from frontier import FRONTIERS
+
+DEFAULT_SIZES = (64, 128, 256)
+DEFAULT_DENSITY = 0.25
+DEFAULT_QUERIES = 5
+
+# Agents whose search grows much faster than the map are only run on maps
+# up to this many cells.
+MAX_CELLS = {"BiIDDFSAgent": 128 * 128}
+
+# Allowed relative increase over the baseline before a metric is flagged.
+DEFAULT_THRESHOLDS = {
+    "wall_time": 0.25,
+    "expansions": 0.05,
+    "peak_frontier": 0.10,
+    "peak_memory": 0.25,
+    "path_cost": 1e-6,
+}
+
+# Wall-time changes smaller than this many seconds are timer noise.
+MIN_WALL_TIME_DELTA = 0.01
+
+
+def agent_classes():
+    """Every search agent defined in implemented_agents.py, in file order."""
+    classes = [
+        cls for _, cls in inspect.getmembers(implemented_agents, inspect.isclass)
+        if issubclass(cls, AbstractSearchAgent) and cls.__module__ == implemented_agents.__name__
+    ]
+    return sorted(classes, key=lambda cls: inspect.getsourcelines(cls)[1])
+
+
+def frontier_variant(agent_class, frontier):
+    """Subclass of an agent that searches with the named frontier (see frontier.py)."""
+    return type(f"{agent_class.__name__}[{frontier}]", (agent_class,), {"frontier": frontier})
+
+
+def procedural_map(size, density=DEFAULT_DENSITY, num_pairs=2, seed=0):
+    """Random square map with the given obstacle density and teleport pairs."""
+    rng = np.random.default_rng(seed)
+    cells = bytearray((rng.random(size * size) < density).astype(np.uint8).tobytes())
+    environment = Env.from_buffer(cells, size, size, {}, map_name=f"random-{size}")
+    free = np.flatnonzero(environment.grid.ravel() == 0)
+    picks = rng.choice(free, size=min(2 * num_pairs, len(free) // 2 * 2), replace=False).tolist()
+    for i in range(0, len(picks), 2):
+        a, b = environment.to_cell(picks[i]), environment.to_cell(picks[i + 1])
+        environment.teleports[a] = b
+        environment.teleports[b] = a
+    return environment
+
+
+def solvable_queries(environment, count, seed=0):
+    """Seeded start/goal pairs where the goal is reachable from the start."""
+    rng = random.Random(seed)
+    free = np.flatnonzero(environment.grid.ravel() == 0).tolist()
+    queries = []
+    for _ in range(20 * count):
+        if len(queries) == count or not free:
+            break
+        start = environment.to_cell(rng.choice(free))
+        probe = implemented_agents.BFSAgent(start, start, environment, False)
+        reachable = np.flatnonzero(probe.distance_field().ravel() > 0).tolist()
+        if reachable:
+            queries.append((start, environment.to_cell(rng.choice(reachable))))
+    return queries
+
+
+def search(agent_class, environment, start, goal, euclidean_cost, instrument=False):
+    """One search; returns (path, visited, path cost, stats or None)."""
+    agent = agent_class(start, goal, environment, euclidean_cost)
+    stats = agent.enable_stats() if instrument else None
+    try:
+        path, visited = agent.searching()
+        return path, visited, agent.COST[goal], stats
+    except KeyError:
+        return None, [], math.inf, stats
+
+
+def run_query(agent_class, environment, start, goal, euclidean_cost, repeat=1, measure_memory=True):
+    """
+    Metrics of one query. A first instrumented run (traced by tracemalloc
+    when measuring memory) gives the counters and warms the caches the
+    agents share per Env; then the fastest of `repeat` plain runs counts.
+    """
+    peak_memory = None
+    if measure_memory:
+        tracemalloc.start()
+    path, visited, cost, stats = search(agent_class, environment, start, goal, euclidean_cost, instrument=True)
+    if measure_memory:
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    wall_time = math.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        search(agent_class, environment, start, goal, euclidean_cost)
+        wall_time = min(wall_time, time.perf_counter() - t0)
+
+    return {
+        "wall_time": wall_time,
+        "expansions": len(visited),
+        "heap_pushes": stats.heap_pushes,
+        "peak_frontier": stats.peak_open,
+        "peak_memory": peak_memory,
+        "path_cost": cost,
+        "solved": path is not None,
+    }
+
+
+def benchmark(maps, agents, queries_per_map=DEFAULT_QUERIES, seed=0, repeat=1, measure_memory=True):
+    """
+    Run every agent on every map in both cost modes. Metrics are summed over
+    the queries of a map, except the peaks, which are the largest seen.
+    """
+    results = {}
+    for name, environment in maps:
+        queries = solvable_queries(environment, queries_per_map, seed)
+        for agent_class in agents:
+            if environment.n_cells > MAX_CELLS.get(agent_class.__name__, math.inf):
+                continue
+            for euclidean_cost in (False, True):
+                totals = {"wall_time": 0.0, "expansions": 0, "heap_pushes": 0, "peak_frontier": 0,
+                          "peak_memory": 0, "path_cost": 0.0, "unsolved": 0}
+                for start, goal in queries:
+                    run = run_query(agent_class, environment, start, goal, euclidean_cost, repeat, measure_memory)
+                    totals["wall_time"] += run["wall_time"]
+                    totals["expansions"] += run["expansions"]
+                    totals["heap_pushes"] += run["heap_pushes"]
+                    totals["peak_frontier"] = max(totals["peak_frontier"], run["peak_frontier"])
+                    if run["peak_memory"] is not None:
+                        totals["peak_memory"] = max(totals["peak_memory"], run["peak_memory"])
+                    if run["solved"]:
+                        totals["path_cost"] += run["path_cost"]
+                    else:
+                        totals["unsolved"] += 1
+                totals["path_cost"] = round(totals["path_cost"], 6)
+                totals["queries"] = len(queries)
+                mode = "euclidean" if euclidean_cost else "unit"
+                key = f"{name}|{agent_class.__name__}|{mode}"
+                results[key] = totals
+                print(f"{key:<45} {totals['wall_time']:9.4f}s {totals['expansions']:>9} exp "
+                      f"{totals['heap_pushes']:>9} push {totals['peak_frontier']:>7} open "
+                      f"{totals['peak_memory'] / 1e6:8.2f} MB "
+                      f"cost {totals['path_cost']:.2f}")
+    return results
+
+
+def compare(results, baseline, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Metrics that grew by more than their threshold over the baseline, as
+    (key, metric, baseline value, new value).
+    """
+    regressions = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        for metric, limit in thresholds.items():
+            before, after = old.get(metric), new.get(metric)
+            if not before or after is None:
+                continue
+            if metric == "wall_time" and after - before < MIN_WALL_TIME_DELTA:
+                continue
+            if after > before * (1 + limit):
+                regressions.append((key, metric, before, after))
+    return regressions
+
+
+def load_maps(names, sizes, density, seed):
+    """
+    The maps to run on, with every teleport cost drawn up front from a
+    seeded generator so that runs with the same seed see the same graph.
+    """
+    maps = []
+    for name in names:
+        maps.append((name, Env(name, use_random_teleports=False)))
+    for size in sizes:
+        maps.append((f"random-{size}", procedural_map(size, density, seed=seed)))
+
+    random.seed(seed)
+    for _, environment in maps:
+        cache = environment.adjacency(True)
+        for a, b in sorted(environment.teleports.items()):
+            cache.teleport_cost(a, b)
+    return maps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the search agents and track regressions.")
+    parser.add_argument("--maps", nargs="*", help="map names in the Maps folder (default: all of them)")
+    parser.add_argument("--sizes", nargs="*", type=int, default=list(DEFAULT_SIZES),
+                        help="side lengths of the procedural maps")
+    parser.add_argument("--density", type=float, default=DEFAULT_DENSITY, help="obstacle density of procedural maps")
+    parser.add_argument("--agents", nargs="*", help="agent class names (default: all of them)")
+    parser.add_argument("--frontiers", nargs="*", default=[], choices=sorted(FRONTIERS),
+                        help="also run the agents that take a frontier with each of these")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="start/goal pairs per map")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query; the fastest counts")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--out", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--save-baseline", help="also write the results here as the new baseline")
+    for metric, limit in DEFAULT_THRESHOLDS.items():
+        parser.add_argument(f"--max-{metric.replace('_', '-')}", type=float, default=limit,
+                            help=f"allowed relative increase in {metric} (default {limit})")
+    args = parser.parse_args(argv)
+
+    names = args.maps
+    if names is None:
+        names = [
+            name for name in (os.path.basename(p)[:-5] for p in sorted(glob.glob(os.path.join(maps_path, "*.json"))))
+            if '.' not in name
+        ]
+    agents = agent_classes()
+    if args.agents:
+        agents = [cls for cls in agents if cls.__name__ in args.agents]
+    agents += [
+        frontier_variant(cls, frontier)
+        for cls in agents if hasattr(cls, "frontier")
+        for frontier in args.frontiers
+    ]
+
+    maps = load_maps(names, args.sizes, args.density, args.seed)
+    results = benchmark(maps, agents, args.queries, args.seed, args.repeat, not args.no_memory)
+
+    report = {
+        "meta": {
+            "seed": args.seed,
+            "queries": args.queries,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {path}.")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+        thresholds = {metric: getattr(args, f"max_{metric}") for metric in DEFAULT_THRESHOLDS}
+        regressions = compare(results, baseline, thresholds)
+        for key, metric, before, after in regressions:
+            print(f"REGRESSION {key} {metric}: {before:.6g} -> {after:.6g} ({after / before - 1:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import heapq
+import itertools
+import math
+
+from agent import AbstractSearchAgent
+from heuristics import teleport_heuristic
+from implemented_agents import DEFAULT_TABLE_SIZE
+
+DEFAULT_MAX_NODES = 1 << 14
+# SMA* expansion budget per map cell when no max_expansions is given.
+EXPANSIONS_PER_CELL = 32
+
+# f-values closer than this are equal (sums of two-decimal costs).
+EPSILON = 1e-9
+
+
+class BoundedMemoryAgent(AbstractSearchAgent):
+    """
+    Base of the memory-bounded agents: the same heuristic as AStarAgent,
+    and only the path kept in PARENT/COST. `peak_held` counts the most
+    search nodes held at once (a node count, not bytes); `record_visited=False`
+    also drops the list of expanded cells that `searching()` returns for
+    plotting.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, record_visited=True,
+                 max_expansions=None):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+        self.record_visited = record_visited
+        self.max_expansions = max_expansions
+        self.expansions = 0
+        self.peak_held = 0
+        self.seened = []
+
+    def get_h(self, s_from, s_to):
+        return self.heuristic.estimate(s_from, s_to)
+
+    def expand(self, s, held):
+        """Count an expansion of s while `held` nodes are in memory."""
+        if self.max_expansions is not None and self.expansions >= self.max_expansions:
+            raise KeyError(self.s_goal)
+        self.expansions += 1
+        if held > self.peak_held:
+            self.peak_held = held
+        if self.record_visited:
+            self.seened.append(s)
+        if self.stats is not None:
+            self.stats.expand(s, held)
+
+
+class IDAStarAgent(BoundedMemoryAgent):
+    """
+    Iterative-deepening A*: depth-first searches bounded by f = g + h, each
+    bound the smallest f that exceeded the last one. Memory is the current
+    path plus a transposition table of at most `table_size` cells holding
+    the lowest g each was reached at and the iteration that last explored
+    it there. A cell reached at a higher g, or again at the same g in the
+    same iteration, is pruned: grids have many paths to each cell, and
+    without the table every one of them is re-walked.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, table_size=DEFAULT_TABLE_SIZE,
+                 **kwargs):
+        super().__init__(s_start, s_goal, environment, euclidean_cost, **kwargs)
+        self.table_size = table_size
+        self.table = {}
+        self.iterations = 0
+
+    def searching(self):
+        bound = self.get_h(self.s_start, self.s_goal)
+        while True:
+            self.iterations += 1
+            path, bound = self.bounded_search(bound)
+            if path is not None:
+                return self.fill_path(path), self.seened
+            if bound == math.inf:
+                raise KeyError(self.s_goal)
+
+    def bounded_search(self, bound):
+        """
+        One depth-first pass under `bound`; returns (path, None) on reaching
+        the goal, else (None, smallest f beyond the bound).
+        """
+        goal = self.s_goal
+        costs = self.NEIGHBOR_COSTS
+        table = self.table
+        iteration = self.iterations
+        path = [self.s_start]
+        on_path = {self.s_start}
+        # One iterator of unexplored (f, g, neighbor) per path cell.
+        stack = [iter(self.successors(self.s_start, 0, costs))]
+        self.expand(self.s_start, 1)
+        next_bound = math.inf
+        while stack:
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            f, g, s = step
+            if f > bound + EPSILON:
+                next_bound = min(next_bound, f)
+                continue
+            if s in on_path:
+                continue
+            best, explored = table.get(s, (math.inf, 0))
+            if g > best + EPSILON or (g > best - EPSILON and explored == iteration):
+                continue
+            if s in table or len(table) < self.table_size:
+                table[s] = (min(g, best), iteration)
+            path.append(s)
+            on_path.add(s)
+            self.expand(s, len(path) + len(table))
+            if s == goal:
+                return path, None
+            stack.append(iter(self.successors(s, g, costs)))
+        return None, next_bound
+
+    def successors(self, s, g, costs):
+        """(f, g, cell) of the neighbors of s, best f first."""
+        goal = self.s_goal
+        row = costs[s]
+        steps = []
+        for s_next in self.get_neighbors(s):
+            g_next = g + round(row[s_next], 2)
+            steps.append((g_next + self.get_h(s_next, goal), g_next, s_next))
+        steps.sort()
+        return steps
+
+
+class _Node:
+    __slots__ = ("cell", "g", "f", "parent", "depth", "children", "forgotten", "alive", "key")
+
+    def __init__(self, cell, g, f, parent, depth):
+        self.cell = cell
+        self.g = g
+        self.f = f
+        self.parent = parent
+        self.depth = depth
+        self.children = 0
+        self.forgotten = None  # cell -> backed-up f of dropped children
+        self.alive = True
+        self.key = None  # f it was queued with, None when not a leaf in OPEN
+
+
+class SMAStarAgent(BoundedMemoryAgent):
+    """
+    Simplified memory-bounded A* holding at most `max_nodes` search nodes.
+
+    Expands the lowest-f leaf (deepest on ties) like A*. When memory is
+    full, the worst leaf (highest f, shallowest on ties) is dropped and
+    its f is backed up into its parent, which becomes a leaf again once
+    all its children are gone and is re-expanded only when that backed-up
+    f is the best left. Optimal as long as the optimal path fits in
+    `max_nodes`; a goal further away than that is reported unreachable.
+
+    The cap trades time for memory: the smaller it is next to the region the
+    search must cover, the more dropped subtrees get regenerated, and with a
+    few hundred nodes one query can thrash through hundreds of thousands of
+    expansions. Unless `max_expansions` is given, the search therefore gives
+    up after EXPANSIONS_PER_CELL expansions per map cell and raises KeyError
+    like an unreachable goal; pass math.inf to search without a budget.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, max_nodes=DEFAULT_MAX_NODES,
+                 max_expansions=None, **kwargs):
+        if max_expansions is None:
+            max_expansions = EXPANSIONS_PER_CELL * environment.n_cells
+        super().__init__(s_start, s_goal, environment, euclidean_cost, max_expansions=max_expansions, **kwargs)
+        self.max_nodes = max(2, max_nodes)
+        self.dropped = 0
+
+    def searching(self):
+        goal = self.s_goal
+        costs = self.NEIGHBOR_COSTS
+        counter = itertools.count()
+        best_open, worst_open = [], []  # lazy heaps over the leaves in OPEN
+        members = {}  # cell -> its lowest-g node in memory
+        held = 1
+
+        def queue(node):
+            node.key = node.f
+            order = next(counter)
+            heapq.heappush(best_open, (node.f, -node.depth, order, node))
+            heapq.heappush(worst_open, (-node.f, node.depth, order, node))
+
+        def live(entry, sign):
+            node = entry[3]
+            return node.alive and node.key is not None and node.key == sign * entry[0]
+
+        def drop_worst(keep):
+            """Forget the worst leaf other than `keep`; False if there is none."""
+            spared = []
+            while worst_open:
+                entry = heapq.heappop(worst_open)
+                if not live(entry, -1):
+                    continue
+                node = entry[3]
+                if node is keep or node.parent is None:
+                    spared.append(entry)
+                    continue
+                for entry in spared:
+                    heapq.heappush(worst_open, entry)
+                forget(node)
+                return True
+            for entry in spared:
+                heapq.heappush(worst_open, entry)
+            return False
+
+        def forget(node):
+            nonlocal held
+            node.alive = False
+            node.key = None
+            held -= 1
+            self.dropped += 1
+            if members.get(node.cell) is node:
+                del members[node.cell]
+            parent = node.parent
+            if parent.forgotten is None:
+                parent.forgotten = {}
+            parent.forgotten[node.cell] = min(parent.forgotten.get(node.cell, math.inf), node.f)
+            parent.children -= 1
+            if parent.children == 0:
+                parent.f = min(parent.forgotten.values())
+                if parent.f == math.inf and parent.parent is not None:
+                    forget(parent)
+                else:
+                    queue(parent)
+
+        root = _Node(self.s_start, 0, self.get_h(self.s_start, goal), None, 0)
+        members[root.cell] = root
+        queue(root)
+        while best_open:
+            entry = heapq.heappop(best_open)
+            if not live(entry, 1):
+                continue
+            node = entry[3]
+            if node.f == math.inf:
+                break
+            node.key = None
+            self.expand(node.cell, held)
+            if node.cell == goal:
+                path = []
+                while node is not None:
+                    path.append(node.cell)
+                    node = node.parent
+                path.reverse()
+                return self.fill_path(path), self.seened
+
+            forgotten = node.forgotten or {}
+            children = []
+            if node.depth + 1 < self.max_nodes:
+                row = costs[node.cell]
+                for s_next in self.get_neighbors(node.cell):
+                    g_next = node.g + round(row[s_next], 2)
+                    other = members.get(s_next)
+                    if other is not None and other.g <= g_next + EPSILON:
+                        continue  # dominated, including every cycle back up the path
+                    f_next = max(node.f, g_next + self.get_h(s_next, goal), forgotten.get(s_next, 0))
+                    child = _Node(s_next, g_next, f_next, node, node.depth + 1)
+                    members[s_next] = child
+                    children.append(child)
+            node.forgotten = None
+            if not children:
+                node.f = math.inf
+                if node.parent is None:
+                    break
+                forget(node)
+                continue
+
+            node.children = len(children)
+            held += len(children)
+            for child in children:
+                queue(child)
+            best_child = min(children, key=lambda c: c.f)
+            while held > self.max_nodes and drop_worst(best_child):
+                pass
+
+            # Drop the stale entries once they outnumber the live ones.
+            if len(best_open) > 4 * held + 64:
+                best_open[:] = [e for e in best_open if live(e, 1)]
+                heapq.heapify(best_open)
+                worst_open[:] = [e for e in worst_open if live(e, -1)]
+                heapq.heapify(worst_open)
+
+        raise KeyError(goal)
@@ -0,0 +1,161 @@
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import numpy as np
+
+from server import DEFAULT_AGENT, DEFAULT_PORT
+
+
+class PathClient:
+    """
+    Client for a PathServer. Requests are pipelined over one connection and
+    matched to their answers by id, so many can be awaited at once.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.pop(response.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection to the path server closed"))
+
+    async def request(self, message):
+        """Send one request object and return the server's answer."""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(json.dumps({**message, "id": request_id}).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def query(self, map_name, start, goal, agent=DEFAULT_AGENT, euclidean_cost=True):
+        """Path from start to goal; raises ValueError if the server rejects it."""
+        response = await self.request({
+            "map": map_name, "start": list(start), "goal": list(goal),
+            "agent": agent, "euclidean_cost": euclidean_cost,
+        })
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response
+
+    async def stats(self):
+        return await self.request({"op": "stats"})
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+
+async def load(client, map_name, queries, total, concurrency, agent=DEFAULT_AGENT, euclidean_cost=True):
+    """
+    Send `total` queries drawn in turn from `queries`, with at most
+    `concurrency` outstanding; returns (seconds, latencies in seconds seen
+    by the client, errors).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(start, goal):
+        nonlocal errors
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                await client.query(map_name, start, goal, agent, euclidean_cost)
+            except ValueError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(*queries[i % len(queries)]) for i in range(total)))
+    return time.perf_counter() - t0, latencies, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query a path server, or put load on it.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="connect to this Unix socket path instead of TCP")
+    parser.add_argument("--agent", default=DEFAULT_AGENT)
+    parser.add_argument("--unit-cost", action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help="plan one path")
+    query.add_argument("map")
+    query.add_argument("start", type=int, nargs=2, metavar=("X", "Y"))
+    query.add_argument("goal", type=int, nargs=2, metavar=("X", "Y"))
+
+    commands.add_parser("stats", help="print the server's counters and latency percentiles")
+
+    generate = commands.add_parser("load", help="send many queries and report latency")
+    generate.add_argument("map")
+    generate.add_argument("--requests", type=int, default=1000)
+    generate.add_argument("--concurrency", type=int, default=32)
+    generate.add_argument("--distinct", type=int, default=100,
+                          help="distinct start/goal pairs the requests cycle through")
+    generate.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    async def run():
+        client = await PathClient.connect(args.host, args.port, args.unix)
+        try:
+            if args.command == "query":
+                print(json.dumps(await client.query(args.map, args.start, args.goal, args.agent,
+                                                    not args.unit_cost)))
+            elif args.command == "stats":
+                print(json.dumps(await client.stats(), indent=2))
+            else:
+                from benchmark import solvable_queries
+                from env import Env
+
+                environment = Env(args.map, use_random_teleports=False)
+                queries = solvable_queries(environment, args.distinct, args.seed)
+                elapsed, latencies, errors = await load(
+                    client, args.map, queries, args.requests, args.concurrency, args.agent, not args.unit_cost,
+                )
+                latencies = np.array(latencies) * 1000
+                print(f"{args.requests} requests in {elapsed:.3f}s "
+                      f"({args.requests / elapsed:.1f}/s), {errors} errors")
+                if len(latencies):
+                    print("client latency ms: " + "  ".join(
+                        f"p{p:g} {np.percentile(latencies, p):.2f}" for p in (50, 90, 99, 99.9)))
+                print("server: " + json.dumps(await client.stats()))
+        finally:
+            await client.close()
+
+    try:
+        asyncio.run(run())
+    except (ValueError, OSError) as e:
+        raise SystemExit(f"error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 import json
 import os
 import random
+import weakref
+from collections.abc import MutableSet
+
+import numpy as np
+
+import mapfile
+from adjacency import AdjacencyCache
 
 maps_path = os.path.join(
     os.path.abspath(
@@ -10,76 +17,293 @@ maps_path = os.path.join(
     "Maps",
 )
 
+DEFAULT_X_RANGE = 51
+DEFAULT_Y_RANGE = 31
+
+
+class ObstacleSet(MutableSet):
+    """
+    Set-like view of the obstacle cells of an Env.
+
+    Membership, add and remove go straight to the one-byte-per-cell
+    occupancy buffer, so existing `(x, y) in env.obs` / `env.obs.add(...)`
+    code keeps working without a Python set of tuples behind it.
+    """
+
+    def __init__(self, environment):
+        self.env = environment
+
+    def __contains__(self, s):
+        x, y = s
+        env = self.env
+        if 0 <= x < env.x_range and 0 <= y < env.y_range:
+            return env.cells[x * env.y_range + y] != 0
+        return False
+
+    def __iter__(self):
+        xs, ys = np.nonzero(self.env.grid)
+        return zip(xs.tolist(), ys.tolist())
+
+    def __len__(self):
+        return int(np.count_nonzero(self.env.grid))
+
+    def add(self, s):
+        self.env.set_obstacle(s, True)
+
+    def discard(self, s):
+        if s in self:
+            self.env.set_obstacle(s, False)
+
+    def remove(self, s):
+        if s not in self:
+            raise KeyError(s)
+        self.env.set_obstacle(s, False)
+
+    def __repr__(self):
+        return f"ObstacleSet({len(self)} cells)"
+
+
+class TeleportMap(dict):
+    """
+    Teleport dict of an Env that reports every edit back to the Env, so
+    caches built on top of the map can drop what the edit touched.
+    """
+
+    def __init__(self, environment, pairs=()):
+        super().__init__(pairs)
+        self.env = environment
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.env.notify_changed([key])
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.env.notify_changed([key])
+
+    def pop(self, key, *default):
+        had = key in self
+        value = super().pop(key, *default)
+        if had:
+            self.env.notify_changed([key])
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.env.notify_changed([key])
+        return key, value
+
+    def clear(self):
+        keys = list(self)
+        super().clear()
+        self.env.notify_changed(keys)
+
+    def update(self, *args, **kwargs):
+        other = dict(*args, **kwargs)
+        super().update(other)
+        self.env.notify_changed(list(other))
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def __reduce__(self):
+        # Rebuilt in one go: the default dict pickling would refill the
+        # items through __setitem__ before `env` is restored.
+        return TeleportMap, (self.env, dict(self))
+
 
 class Env:
     def __init__(self, map_name, use_random_teleports=True, num_pairs=2):
-        self.x_range = 51
-        self.y_range = 31
+        data = self.load_map(map_name)
+        x_range = data.get("x_range", DEFAULT_X_RANGE)
+        y_range = data.get("y_range", DEFAULT_Y_RANGE)
+        cells = data.get("cells")
+        self.setup(map_name, cells if cells is not None else bytearray(x_range * y_range), x_range, y_range)
+
+        self.load_obstacles(data)
+        teleports = self.load_teleports(data)
+
+        if use_random_teleports:
+            teleports = self.generate_random_teleports(num_pairs)
+        self.teleports = TeleportMap(self, teleports)
+
+    @classmethod
+    def from_buffer(cls, cells, x_range, y_range, teleports, map_name=None):
+        """
+        Build an Env over an existing occupancy buffer (e.g. shared memory)
+        without reading a map file. The buffer is used as is, not copied.
+        """
+        environment = cls.__new__(cls)
+        environment.map_path = None
+        environment.setup(map_name, cells, x_range, y_range)
+        environment.teleports = TeleportMap(environment, teleports)
+        return environment
+
+    def setup(self, map_name, cells, x_range, y_range):
+        self.map_name = map_name
         self.motions = [
             (-1, 0), (-1, 1), (0, 1), (1, 1),
             (1, 0), (1, -1), (0, -1), (-1, -1)
         ]
+        self.x_range = x_range
+        self.y_range = y_range
+        self.n_cells = self.x_range * self.y_range
 
-        self.obs = self.load_obstacles(map_name)
-        self.teleports = self.load_teleports(map_name)
+        # One byte per cell, flat index = x * y_range + y. `grid` is a NumPy
+        # view over the same buffer for vectorized work.
+        self.cells = cells
+        self.grid = np.frombuffer(self.cells, dtype=np.uint8, count=self.n_cells).reshape(self.x_range, self.y_range)
+        self.obs = ObstacleSet(self)
 
-        if use_random_teleports:
-            self.teleports = self.generate_random_teleports(num_pairs)
+        # Bumped on every obstacle/teleport edit; listeners get the edited cells.
+        self.version = 0
+        self.listeners = []
+        self.adjacency_caches = {}
+        self.hierarchies = {}  # HPA* abstractions, see hierarchical.hierarchy
 
-    def load_obstacles(self, map_name="default"):
-        """Load obstacles from the map file correctly."""
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["cells"] = bytearray(self.cells)  # may be a read-only memory map
+        del state["grid"]
+        # Weakly held listeners belong to objects watching this Env, not its copy.
+        state["listeners"] = [cb for cb in self.listeners if not isinstance(cb, weakref.WeakMethod)]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.grid = np.frombuffer(self.cells, dtype=np.uint8, count=self.n_cells).reshape(self.x_range, self.y_range)
+
+    def load_map(self, map_name="default"):
+        """
+        Read the map file once; a missing file gives an empty default map.
+        A binary map (see mapfile.py) is memory-mapped instead when it is at
+        least as new as the JSON file.
+        """
         file_path = os.path.join(maps_path, map_name + '.json')
-        obs = set()
+        binary_path = os.path.join(maps_path, map_name + mapfile.EXTENSION)
+        if os.path.exists(binary_path) and (
+                not os.path.exists(file_path) or os.path.getmtime(binary_path) >= os.path.getmtime(file_path)):
+            self.map_path = binary_path
+            data = mapfile.read_map(binary_path)
+            print(f"Map loaded from {binary_path}.")
+            return data
 
+        self.map_path = file_path
         try:
             with open(file_path, 'r') as f:
                 data = json.load(f)
-
-                if "obstacles" in data:
-                    obs = set(tuple(ob) for ob in data["obstacles"])
-
-                print(f"Obstacles loaded from {file_path}.")
+            print(f"Map loaded from {file_path}.")
         except FileNotFoundError:
             print(f"File {file_path} not found. No obstacles loaded.")
+            data = {}
 
-        return obs
+        return data
 
-    def load_teleports(self, map_name="default"):
-        """Load teleport pairs from the map file if they exist."""
-        file_path = os.path.join(maps_path, map_name + '.json')
+    def load_obstacles(self, data):
+        """Mark the obstacles of the map data on the occupancy grid."""
+        if data.get("obstacles"):
+            pts = np.asarray(data["obstacles"], dtype=np.int64).reshape(-1, 2)
+            inside = self.in_bounds(pts[:, 0], pts[:, 1])
+            self.grid[pts[inside, 0], pts[inside, 1]] = 1
+
+        return self.obs
+
+    def load_teleports(self, data):
+        """Load teleport pairs from the map data if they exist."""
         teleports = {}
 
-        try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                if "teleports" in data:
-                    for pair in data["teleports"]:
-                        if len(pair) == 2:
-                            a, b = tuple(pair[0]), tuple(pair[1])
-                            teleports[a] = b
-                            teleports[b] = a  # Ensure bidirectional teleporting
-            print(f"Teleports loaded from {file_path}: {teleports}")
-        except FileNotFoundError:
-            print(f"File {file_path} not found. No predefined teleports.")
+        for pair in data.get("teleports", []):
+            if len(pair) == 2:
+                a, b = tuple(pair[0]), tuple(pair[1])
+                teleports[a] = b
+                teleports[b] = a  # Ensure bidirectional teleporting
+        if teleports:
+            print(f"Teleports loaded: {teleports}")
         return teleports
 
     def generate_random_teleports(self, num_pairs=2):
         """Generate random teleport pairs on non-obstacle cells."""
-        empty_cells = [
-            (x, y) for x in range(self.x_range)
-            for y in range(self.y_range)
-            if (x, y) not in self.obs
-        ]
-        random.shuffle(empty_cells)
+        free = np.flatnonzero(self.grid.ravel() == 0)
+        picks = random.sample(range(len(free)), min(2 * num_pairs, len(free) // 2 * 2))
 
         teleports = {}
-        for _ in range(num_pairs):
-            if len(empty_cells) < 2:
-                break
-            a = empty_cells.pop()
-            b = empty_cells.pop()
+        for i in range(0, len(picks), 2):
+            a = self.to_cell(int(free[picks[i]]))
+            b = self.to_cell(int(free[picks[i + 1]]))
             teleports[a] = b
             teleports[b] = a  # Bidirectional linking
 
         print(f"Generated random teleport pairs: {teleports}")
         return teleports
+
+    def to_index(self, s):
+        """Flat cell index of (x, y)."""
+        return s[0] * self.y_range + s[1]
+
+    def to_cell(self, idx):
+        """(x, y) of a flat cell index."""
+        return divmod(idx, self.y_range)
+
+    def in_bounds(self, xs, ys):
+        """Vectorized bounds check over coordinate arrays."""
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        return (xs >= 0) & (xs < self.x_range) & (ys >= 0) & (ys < self.y_range)
+
+    def is_free(self, xs, ys):
+        """Vectorized check: inside the map and not an obstacle."""
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        inside = self.in_bounds(xs, ys)
+        free = np.zeros(inside.shape, dtype=bool)
+        free[inside] = self.grid[xs[inside], ys[inside]] == 0
+        return free
+
+    def set_obstacle(self, s, blocked=True):
+        """Mark or clear a single obstacle cell."""
+        x, y = s
+        if not (0 <= x < self.x_range and 0 <= y < self.y_range):
+            raise ValueError(f"cell {s} is outside the {self.x_range}x{self.y_range} map")
+        self.cells[x * self.y_range + y] = 1 if blocked else 0
+        self.notify_changed([s])
+
+    def add_listener(self, callback, weak=False):
+        """
+        Call `callback(changed_cells)` after every map edit. With `weak=True`
+        a bound method is held through a WeakMethod, so listening does not
+        keep its object alive; it is dropped once the object is collected.
+        """
+        self.listeners.append(weakref.WeakMethod(callback) if weak else callback)
+
+    def remove_listener(self, callback):
+        for i, listener in enumerate(self.listeners):
+            if listener == callback or (isinstance(listener, weakref.WeakMethod) and listener() == callback):
+                del self.listeners[i]
+                return
+        raise ValueError(f"{callback!r} is not listening")
+
+    def notify_changed(self, changed):
+        self.version += 1
+        for listener in list(self.listeners):
+            if isinstance(listener, weakref.WeakMethod):
+                callback = listener()
+                if callback is None:
+                    self.listeners.remove(listener)
+                    continue
+            else:
+                callback = listener
+            callback(changed)
+
+    def adjacency(self, euclidean_cost=True):
+        """Shared adjacency store of this map for one cost mode."""
+        cache = self.adjacency_caches.get(euclidean_cost)
+        if cache is None:
+            cache = AdjacencyCache(self, euclidean_cost)
+            self.adjacency_caches[euclidean_cost] = cache
+        return cache
+
+    def neighbor_costs(self, euclidean_cost=True):
+        """`NEIGHBOR_COSTS`-style mapping shared by every agent on this map."""
+        return self.adjacency(euclidean_cost).view
@@ -0,0 +1,173 @@
+import heapq
+import math
+import weakref
+
+import numpy as np
+
+from adjacency import step_cost
+from agent import AbstractSearchAgent
+
+# next_step codes besides the indices into Env.motions.
+TELEPORT = 254  # take the teleport out of this cell
+NO_STEP = 255   # the goal itself, an obstacle, or a cell that cannot reach the goal
+
+# Flow fields kept per Env before the oldest is dropped.
+MAX_FIELDS = 16
+
+_shared = weakref.WeakKeyDictionary()
+
+
+class FlowField:
+    """
+    Shortest paths from every cell to one goal.
+
+    `dist[x, y]` is the cost from (x, y) to the goal (inf if it cannot get
+    there) and `next_step[x, y]` says where to go next: an index into
+    `motions`, TELEPORT, or NO_STEP. Any start's path is read off in
+    O(path length), without searching.
+    """
+
+    def __init__(self, goal, dist, next_step, motions, teleports, euclidean_cost=True):
+        self.goal = tuple(goal)
+        self.dist = dist
+        self.next_step = next_step
+        self.motions = [tuple(m) for m in motions]
+        self.teleports = dict(teleports)
+        self.euclidean_cost = euclidean_cost
+        self.x_range, self.y_range = dist.shape
+
+    @classmethod
+    def build(cls, environment, goal, euclidean_cost=True):
+        """One reverse Dijkstra from `goal` over grid moves and teleports."""
+        x_range, y_range = environment.x_range, environment.y_range
+        cells = environment.cells
+        cache = environment.adjacency(euclidean_cost)
+        motions = environment.motions
+        # u -> u + m is relaxed backwards from v = u + m, i.e. u = v - m.
+        moves = [(k, -dx, -dy, -(dx * y_range + dy), step_cost(dx, dy, euclidean_cost))
+                 for k, (dx, dy) in enumerate(motions)]
+        exits = {environment.to_index(a): environment.to_index(b) for a, b in environment.teleports.items()}
+        sources = {}
+        for a, b in environment.teleports.items():
+            if not cells[environment.to_index(a)]:
+                sources.setdefault(environment.to_index(b), []).append(
+                    (environment.to_index(a), round(cache.teleport_cost(a, b), 2)))
+
+        n = environment.n_cells
+        dist = [math.inf] * n
+        next_step = bytearray([NO_STEP]) * n
+        g = environment.to_index(goal)
+        dist[g] = 0.0
+        que = [(0.0, g)]
+        while que:
+            d, v = heapq.heappop(que)
+            if d > dist[v]:
+                continue
+            x, y = divmod(v, y_range)
+            for k, dx, dy, shift, cost in moves:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < x_range and 0 <= ny < y_range:
+                    u = v + shift
+                    # An exit next door is reached by the teleport, at its cost.
+                    if not cells[u] and exits.get(u) != v and d + cost < dist[u]:
+                        dist[u] = d + cost
+                        next_step[u] = k
+                        heapq.heappush(que, (d + cost, u))
+            for u, cost in sources.get(v, ()):
+                if d + cost < dist[u]:
+                    dist[u] = d + cost
+                    next_step[u] = TELEPORT
+                    heapq.heappush(que, (d + cost, u))
+
+        dist = np.array(dist, dtype=np.float64).reshape(x_range, y_range)
+        next_step = np.frombuffer(next_step, dtype=np.uint8).reshape(x_range, y_range)
+        return cls(goal, dist, next_step, motions, environment.teleports, euclidean_cost)
+
+    def path(self, start):
+        """Cells from `start` to the goal; KeyError if there is no path."""
+        s = tuple(start)
+        if self.dist[s] == math.inf:
+            raise KeyError(s)
+        path = [s]
+        next_step = self.next_step
+        while s != self.goal:
+            k = int(next_step[s])
+            if k == TELEPORT:
+                s = self.teleports[s]
+            else:
+                dx, dy = self.motions[k]
+                s = (s[0] + dx, s[1] + dy)
+            path.append(s)
+        return path
+
+    def cost(self, start):
+        return float(self.dist[tuple(start)])
+
+    def save(self, path):
+        """Write the field as a compressed .npz file (float32 distances)."""
+        teleports = np.array(sorted(a + b for a, b in self.teleports.items()), dtype=np.int32).reshape(-1, 4)
+        np.savez_compressed(
+            path,
+            goal=np.array(self.goal, dtype=np.int32),
+            dist=self.dist.astype(np.float32),
+            next_step=self.next_step,
+            motions=np.array(self.motions, dtype=np.int8),
+            teleports=teleports,
+            euclidean_cost=np.array(bool(self.euclidean_cost)),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            teleports = {(int(ax), int(ay)): (int(bx), int(by)) for ax, ay, bx, by in data["teleports"]}
+            return cls(
+                data["goal"].tolist(),
+                data["dist"].astype(np.float64),
+                data["next_step"],
+                data["motions"].tolist(),
+                teleports,
+                bool(data["euclidean_cost"]),
+            )
+
+
+def flow_field(environment, goal, euclidean_cost=True):
+    """
+    FlowField to `goal` shared by every agent on the Env, rebuilt after the
+    map is edited.
+    """
+    per_env = _shared.setdefault(environment, {})
+    key = (tuple(goal), euclidean_cost)
+    version, field = per_env.get(key, (None, None))
+    if version != environment.version:
+        field = FlowField.build(environment, goal, euclidean_cost)
+        per_env.pop(key, None)
+        if len(per_env) >= MAX_FIELDS:
+            per_env.pop(next(iter(per_env)))
+        per_env[key] = (environment.version, field)
+    return field
+
+
+class FlowFieldAgent(AbstractSearchAgent):
+    """
+    Agent that follows the shared flow field of its goal. The first agent
+    heading to a goal pays for the reverse Dijkstra; every other agent with
+    the same goal only walks its path.
+
+    The field is built in `__init__`, so with stats on its cost shows up
+    in the preprocessing timer; the search itself expands just the path
+    cells it walks and touches no heap.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.field = flow_field(environment, s_goal, euclidean_cost)
+
+    def searching(self):
+        path = self.field.path(self.s_start)
+        stats = self.stats
+        if stats is not None:
+            for s in path:
+                stats.expand(s)
+                if s in self.teleports and self.field.next_step[s] == TELEPORT:
+                    stats.teleport_uses += 1
+        return self.fill_path(path), list(path)
@@ -0,0 +1,266 @@
+import heapq
+import math
+
+# Edge costs are rounded to two decimals and the heuristics are sums of
+# such costs, so keys are exact integers in hundredths.
+SCALE = 100
+
+
+def scaled(cost):
+    """Integer key of a cost in hundredths."""
+    return int(round(cost * SCALE))
+
+
+class HeapQueue:
+    """
+    Plain `heapq` frontier in the shared interface: every push is a new
+    entry and stale ones are skipped when popped. The baseline the other
+    frontiers are measured against.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.count = 0  # tie breaker, so payloads are never compared
+
+    def push(self, key, cell, data):
+        self.count += 1
+        heapq.heappush(self.heap, (key, self.count, cell, data))
+
+    def pop(self):
+        key, _, cell, data = heapq.heappop(self.heap)
+        return key, cell, data
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class BucketQueue:
+    """
+    Dial's bucket queue for monotone integer keys: a circular array of
+    buckets, one per key, scanned forward from the last key popped. Push
+    and pop are O(1) plus the scan over empty buckets; the array grows when
+    a key lands further ahead than it spans. A key below the last one
+    popped raises ValueError.
+    """
+
+    def __init__(self, size=256):
+        self.buckets = [[] for _ in range(size)]
+        self.cursor = 0
+        self.size = 0
+
+    def push(self, key, cell, data):
+        if key < self.cursor:
+            raise ValueError(f"key {key} is below the last key popped ({self.cursor}); keys must be monotone")
+        if key - self.cursor >= len(self.buckets):
+            self._grow(key - self.cursor + 1)
+        self.buckets[key % len(self.buckets)].append((key, cell, data))
+        self.size += 1
+
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from an empty queue")
+        buckets = self.buckets
+        n = len(buckets)
+        while not buckets[self.cursor % n]:
+            self.cursor += 1
+        self.size -= 1
+        return buckets[self.cursor % n].pop()
+
+    def _grow(self, span):
+        n = len(self.buckets)
+        while n < span:
+            n *= 2
+        entries = [entry for bucket in self.buckets for entry in bucket]
+        self.buckets = [[] for _ in range(n)]
+        for entry in entries:
+            self.buckets[entry[0] % n].append(entry)
+
+    def __len__(self):
+        return self.size
+
+
+class RadixHeap:
+    """
+    Radix heap for monotone integer keys. Entries sit in the bucket of the
+    highest bit in which their key differs from the last key popped; a pop
+    from an empty bucket 0 redistributes the lowest non-empty bucket around
+    its minimum, so each entry moves at most O(log C) times. A key below
+    the last one popped raises ValueError.
+    """
+
+    def __init__(self):
+        self.buckets = [[] for _ in range(65)]
+        self.last = 0
+        self.size = 0
+
+    def push(self, key, cell, data):
+        if key < self.last:
+            raise ValueError(f"key {key} is below the last key popped ({self.last}); keys must be monotone")
+        self.buckets[(key ^ self.last).bit_length()].append((key, cell, data))
+        self.size += 1
+
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from an empty queue")
+        buckets = self.buckets
+        if not buckets[0]:
+            i = 1
+            while not buckets[i]:
+                i += 1
+            bucket = buckets[i]
+            buckets[i] = []
+            self.last = last = min(entry[0] for entry in bucket)
+            for entry in bucket:
+                buckets[(entry[0] ^ last).bit_length()].append(entry)
+        self.size -= 1
+        return buckets[0].pop()
+
+    def __len__(self):
+        return self.size
+
+
+class IndexedHeap:
+    """
+    Binary heap with a position index per cell. A push for a cell already
+    queued lowers its key (decrease-key) or is dropped, so the heap never
+    holds a cell twice and nothing stale is ever popped.
+    """
+
+    def __init__(self):
+        self.heap = []  # [key, cell, data] entries
+        self.position = {}
+
+    def push(self, key, cell, data):
+        i = self.position.get(cell)
+        if i is None:
+            i = len(self.heap)
+            self.heap.append([key, cell, data])
+        elif key < self.heap[i][0]:
+            self.heap[i][0] = key
+            self.heap[i][2] = data
+        else:
+            return
+        self._sift_up(i)
+
+    def pop(self):
+        heap = self.heap
+        top = heap[0]
+        last = heap.pop()
+        del self.position[top[1]]
+        if heap:
+            heap[0] = last
+            self.position[last[1]] = 0
+            self._sift_down(0)
+        return tuple(top)
+
+    def _sift_up(self, i):
+        heap, position = self.heap, self.position
+        entry = heap[i]
+        while i:
+            parent = (i - 1) >> 1
+            if heap[parent][0] <= entry[0]:
+                break
+            heap[i] = heap[parent]
+            position[heap[i][1]] = i
+            i = parent
+        heap[i] = entry
+        position[entry[1]] = i
+
+    def _sift_down(self, i):
+        heap, position = self.heap, self.position
+        n = len(heap)
+        entry = heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1][0] < heap[child][0]:
+                child += 1
+            if entry[0] <= heap[child][0]:
+                break
+            heap[i] = heap[child]
+            position[heap[i][1]] = i
+            i = child
+        heap[i] = entry
+        position[entry[1]] = i
+
+    def __len__(self):
+        return len(self.heap)
+
+
+FRONTIERS = {
+    "heapq": HeapQueue,
+    "dial": BucketQueue,
+    "radix": RadixHeap,
+    "indexed": IndexedHeap,
+}
+
+
+def make_frontier(frontier):
+    """A new frontier from a name in FRONTIERS or a frontier class."""
+    if isinstance(frontier, str):
+        try:
+            frontier = FRONTIERS[frontier]
+        except KeyError:
+            raise ValueError(f"Unknown frontier {frontier!r}, expected one of {sorted(FRONTIERS)}") from None
+    return frontier()
+
+
+def best_first(agent, frontier, heuristic=None):
+    """
+    UCS (or A* with `heuristic(s)`) for `agent` over a pluggable frontier,
+    keyed by f in hundredths. A neighbor is only pushed when it improves
+    its best known cost, so lazy frontiers hold fewer stale entries than
+    the tuple-per-relaxation heapq loop. Fills PARENT/COST/VISITED like
+    the agents' own loops and returns (path, visited order).
+
+    With a consistent heuristic f never drops below the f it was expanded
+    from, but a float heuristic (ALT's float32 tables) can undershoot it by
+    rounding; a key less than one hundredth below the popped key is taken
+    as that noise and keyed with it. Anything lower reaches the frontier,
+    where the monotone ones (dial, radix) raise ValueError.
+    """
+    start, goal = agent.s_start, agent.s_goal
+    stats = agent.stats
+    costs = agent.NEIGHBOR_COSTS
+    closed = agent.VISITED
+    queue = make_frontier(frontier)
+    best = {start: 0}
+    seened = []
+    queue.push(scaled(heuristic(start)) if heuristic else 0, start, (0, start))
+    while len(queue):
+        key, point, (g, parent) = queue.pop()
+        if stats is not None:
+            stats.heap_pops += 1
+        if point in closed:
+            if stats is not None:
+                stats.stale_pops += 1
+            continue
+        agent.PARENT[point] = parent
+        agent.COST[point] = g
+        closed.add(point)
+        seened.append(point)
+        if stats is not None:
+            stats.expand(point)
+        if point == goal:
+            break
+        for neighbor in agent.get_neighbors(point):
+            if neighbor in closed:
+                continue
+            g_next = g + round(costs[point][neighbor], 2)
+            if g_next >= best.get(neighbor, math.inf):
+                continue
+            best[neighbor] = g_next
+            f = g_next + heuristic(neighbor) if heuristic else g_next
+            if f == math.inf:
+                continue  # the goal cannot be reached from there
+            f_key = scaled(f)
+            if f_key < key and f * SCALE > key - 1:
+                f_key = key
+            queue.push(f_key, neighbor, (g_next, point))
+            if stats is not None:
+                stats.heap_pushes += 1
+                if len(queue) > stats.peak_open:
+                    stats.peak_open = len(queue)
+
+    return agent.extract_path(), seened
@@ -1,10 +1,14 @@
 import json
+import math
 import os
 import random
 
+import numpy as np
 import pygame
 
 import env
+import mapfile
+from viewport import Viewport
 
 maps_path = os.path.join(
     os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)),
@@ -19,31 +23,50 @@ class Generator:
         self.mode = 'obstacle'  # Can be 'obstacle' or 'teleport'
         self.pending_gate = None
         pygame.init()
-        self.screen = pygame.display.set_mode((self.env.x_range * 20, self.env.y_range * 20))
+        self.view = Viewport(self.env.x_range, self.env.y_range)
+        self.screen = pygame.display.set_mode(self.view.size)
         pygame.display.set_caption("Map Editor")
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont(None, 24)
 
+        # LOD drawing: one RGB pixel per cell, and the map area scaled from
+        # it for the current view; edits only redraw the tiles they touch.
+        self.rgb = self.map_rgb()
+        self.map_layer = None
+        self.layer_view = None
+        self.env.add_listener(self.on_map_change, weak=True)
+
     def draw_grid(self, mouse_pos):
         """Draw everything: grid, elements, hover, and mode label"""
         self.screen.fill((255, 255, 255))  # White
 
-        for x in range(self.env.x_range):
-            for y in range(self.env.y_range):
-                rect = pygame.Rect(x * 20, y * 20, 20, 20)
-                pos = (x, y)
-
-                if pos in self.env.obs:
-                    pygame.draw.rect(self.screen, (0, 0, 0), rect)
-                elif pos in self.env.teleports:
-                    color = self.get_pair_color(pos)
-                    pygame.draw.rect(self.screen, color, rect)
-                else:
-                    pygame.draw.rect(self.screen, (200, 200, 200), rect, 1)
+        if self.view.lod:
+            # Too small for per-cell rects: one pixel per cell, scaled.
+            view = (self.view.cell_size, self.view.x0, self.view.y0)
+            if self.layer_view != view:
+                self.map_layer = pygame.Surface(self.screen.get_size())
+                self.map_layer.fill((255, 255, 255))
+                self.view.blit_image(self.map_layer, self.rgb)
+                self.layer_view = view
+            self.screen.blit(self.map_layer, (0, 0))
+        else:
+            x_lo, x_hi, y_lo, y_hi = self.view.visible()
+            for x in range(x_lo, x_hi):
+                for y in range(y_lo, y_hi):
+                    rect = self.cell_rect((x, y))
+                    pos = (x, y)
+
+                    if pos in self.env.obs:
+                        pygame.draw.rect(self.screen, (0, 0, 0), rect)
+                    elif pos in self.env.teleports:
+                        color = self.get_pair_color(pos)
+                        pygame.draw.rect(self.screen, color, rect)
+                    else:
+                        pygame.draw.rect(self.screen, (200, 200, 200), rect, 1)
 
         # Hover logic with validation
-        grid_pos = (mouse_pos[0] // 20, mouse_pos[1] // 20)
-        rect = pygame.Rect(grid_pos[0] * 20, grid_pos[1] * 20, 20, 20)
+        grid_pos = self.view.to_cell(mouse_pos)
+        rect = self.cell_rect(grid_pos)
 
         valid_hover = False
         if self.mode == 'obstacle':
@@ -55,7 +78,7 @@ class Generator:
         if valid_hover:
             if self.mode == 'teleport' and self.pending_gate and grid_pos not in self.env.teleports:
                 pg = self.pending_gate
-                pending_rect = pygame.Rect(pg[0] * 20, pg[1] * 20, 20, 20)
+                pending_rect = self.cell_rect(pg)
                 pygame.draw.rect(self.screen, (0, 200, 255), pending_rect, 3)
                 pygame.draw.rect(self.screen, (0, 255, 0), rect, 2)
             else:
@@ -63,11 +86,36 @@ class Generator:
 
         # Top-right mode label
         label = self.font.render(f"Mode: {self.mode.title()}", True, (0, 0, 0))
-        label_pos = (self.env.x_range * 20 - 150, 25)
+        label_pos = (self.view.width - 150, 25)
         self.screen.blit(label, label_pos)
 
         pygame.display.update()
 
+    def map_rgb(self):
+        rgb = np.full((self.env.x_range, self.env.y_range, 3), 255, dtype=np.uint8)
+        rgb[self.env.grid != 0] = 0
+        for pos in self.env.teleports:
+            rgb[pos] = self.get_pair_color(pos)
+        return rgb
+
+    def on_map_change(self, changed):
+        """Recolor the edited cells and redraw their tiles of the LOD layer."""
+        for pos in changed:
+            if pos in self.env.obs:
+                self.rgb[pos] = 0
+            elif pos in self.env.teleports:
+                self.rgb[pos] = self.get_pair_color(pos)
+            else:
+                self.rgb[pos] = 255
+        if self.layer_view is not None and changed:
+            self.view.blit_cells(self.map_layer, self.rgb, list(changed))
+
+    def cell_rect(self, pos):
+        """Screen rect of a cell at the current zoom (at least 2 pixels)."""
+        left, top = self.view.to_screen(pos)
+        size = max(2, math.ceil(self.view.cell_size))
+        return pygame.Rect(int(left), int(top), size, size)
+
     def get_pair_color(self, pos):
         """Generate consistent color for a teleporter pair"""
         pair = tuple(sorted([pos, self.env.teleports[pos]]))
@@ -108,8 +156,13 @@ class Generator:
                 if event.type == pygame.QUIT:
                     running = False
 
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    grid_pos = (mouse_pos[0] // 20, mouse_pos[1] // 20)
+                elif self.view.handle_event(event):
+                    continue  # Zoomed or panned
+
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    grid_pos = self.view.to_cell(mouse_pos)
+                    if not (0 <= grid_pos[0] < self.env.x_range and 0 <= grid_pos[1] < self.env.y_range):
+                        continue
 
                     if self.mode == 'obstacle':
                         if grid_pos in self.env.obs:
@@ -134,7 +187,12 @@ class Generator:
         pygame.quit()
 
     def save_map(self, file_path):
-        """Save both obstacles and teleport data to JSON"""
+        """Save both obstacles and teleport data to JSON, or to a binary map for a .bmap path"""
+        if file_path.endswith(mapfile.EXTENSION):
+            mapfile.write_map(file_path, self.env.x_range, self.env.y_range, self.env.cells,
+                              mapfile.teleport_pairs(self.env.teleports))
+            print(f"Map saved to {file_path}.")
+            return
 
         teleports_formatted = [
             [list(k), list(v)]
@@ -143,6 +201,8 @@ class Generator:
         ]
 
         map_data = {
+            "x_range": self.env.x_range,
+            "y_range": self.env.y_range,
             "obstacles": list(self.env.obs),
             "teleports": teleports_formatted
         }
@@ -0,0 +1,330 @@
+import argparse
+import heapq
+import json
+import math
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import numpy as np
+
+from agent import AbstractSearchAgent
+from env import Env
+from heuristics import teleport_heuristic
+from sharedmap import attach_array, attach_map, share_array, share_map
+
+DEFAULT_BATCH_SIZE = 64
+
+# Expansions a worker makes between looks at its inbox.
+EXPANSIONS_PER_POLL = 64
+
+# Seconds between the coordinator's termination checks.
+POLL_INTERVAL = 0.001
+
+DEFAULT_WORKER_COUNTS = (1, 2, 4, 8, 16)
+
+# Shared blocks a worker maps; kept referenced so they are only unmapped
+# when the process exits, after every NumPy view of them is gone.
+_blocks = []
+
+
+def owner(idx, workers):
+    """Worker that owns flat cell `idx` (Fibonacci hashing of the index)."""
+    return ((idx * 0x9E3779B1) & 0xFFFFFFFF) * workers >> 32
+
+
+def _search_worker(rank, workers, spec, goal, euclidean_cost, batch_size, inboxes, results,
+                   incumbent, sent, received, idle, done):
+    """
+    One HDA* worker. Owns the cells `owner` maps to it: their open list and
+    best g-values live here, and their parents are written to the shared
+    `parent` array. Nodes generated for other workers' cells are batched
+    per owner and sent to that owner's inbox.
+    """
+    map_spec, adjacency_specs, parent_spec = spec
+    environment = attach_map(map_spec, adjacency_specs, euclidean_cost, _blocks)
+    cache = environment.adjacency(euclidean_cost)
+    y_range = environment.y_range
+    shm, parent = attach_array(parent_spec)
+    _blocks.append(shm)
+
+    goal_cell = environment.to_cell(goal)
+    h_goal = teleport_heuristic(environment, euclidean_cost).toward(goal_cell)
+    row_start, row_end = cache.row_start, cache.row_end
+    neighbors, costs = cache.neighbors, cache.costs
+
+    def h(idx):
+        return h_goal(divmod(idx, y_range))
+
+    inbox = inboxes[rank]
+    outgoing = [[] for _ in range(workers)]
+    open_list = []
+    best = {}
+    expanded = []
+    # heap pushes, heap pops, stale pops, neighbors generated, largest open list
+    counts = [0, 0, 0, 0, 0]
+
+    def accept(batch):
+        for f, g, idx, from_idx in batch:
+            if g < best.get(idx, math.inf) and f < incumbent.value:
+                best[idx] = g
+                heapq.heappush(open_list, (f, g, idx, from_idx))
+                counts[0] += 1
+        if len(open_list) > counts[4]:
+            counts[4] = len(open_list)
+
+    def flush(target):
+        batch = outgoing[target]
+        if batch:
+            outgoing[target] = []
+            sent[rank] += 1
+            inboxes[target].put(batch)
+
+    def receive(block):
+        try:
+            batch = inbox.get(timeout=POLL_INTERVAL) if block else inbox.get_nowait()
+        except queue.Empty:
+            return False
+        idle[rank] = 0
+        received[rank] += 1
+        accept(batch)
+        return True
+
+    try:
+        while not done.is_set():
+            while receive(False):
+                pass
+
+            worked = False
+            for _ in range(EXPANSIONS_PER_POLL):
+                if not open_list or open_list[0][0] >= incumbent.value:
+                    break
+                worked = True
+                f, g, idx, from_idx = heapq.heappop(open_list)
+                counts[1] += 1
+                if g > best[idx]:
+                    counts[2] += 1
+                    continue  # a cheaper copy arrived meanwhile
+                parent[idx] = from_idx
+                expanded.append(idx)
+                if idx == goal:
+                    with incumbent.get_lock():
+                        if g < incumbent.value:
+                            incumbent.value = g
+                    continue
+                counts[3] += row_end[idx] - row_start[idx]
+                for j in range(row_start[idx], row_end[idx]):
+                    nxt = int(neighbors[j])
+                    g_next = g + round(float(costs[j]), 2)
+                    target = owner(nxt, workers)
+                    if target == rank:
+                        if g_next < best.get(nxt, math.inf):
+                            f_next = g_next + h(nxt)
+                            if f_next < incumbent.value:
+                                best[nxt] = g_next
+                                heapq.heappush(open_list, (f_next, g_next, nxt, idx))
+                                counts[0] += 1
+                        continue
+                    f_next = g_next + h(nxt)
+                    if f_next < incumbent.value:
+                        outgoing[target].append((f_next, g_next, nxt, idx))
+                        if len(outgoing[target]) >= batch_size:
+                            flush(target)
+            if len(open_list) > counts[4]:
+                counts[4] = len(open_list)
+            if worked:
+                continue
+
+            # Out of work below the incumbent: send what is left and wait.
+            for target in range(workers):
+                flush(target)
+            idle[rank] = 1
+            receive(True)
+    finally:
+        results.put((rank, np.array(expanded, dtype=np.int64), [int(c) for c in counts]))
+
+
+def _terminated(sent, received, idle):
+    """
+    True when every worker is idle and no batch is in flight, seen twice
+    with no batch sent or received in between.
+    """
+    first = (sum(sent), sum(received))
+    if first[0] != first[1] or not all(idle):
+        return False
+    time.sleep(POLL_INTERVAL)
+    return all(idle) and (sum(sent), sum(received)) == first
+
+
+class HDAStarAgent(AbstractSearchAgent):
+    """
+    Hash-distributed A* over `workers` processes.
+
+    Every cell is owned by one worker (`owner`); a worker expands only its
+    own cells and sends the nodes it generates for other cells to their
+    owners in batches of `batch_size`. The occupancy grid and the CSR
+    adjacency are shared read-only through shared memory, and parents are
+    written to a shared array that only a cell's owner touches.
+
+    Reaching the goal sets the shared incumbent cost, below which every
+    worker keeps expanding. The search is over when all workers are idle
+    (nothing open under the incumbent) and every batch sent has been
+    received; the incumbent is then optimal, as with A*, because any
+    cheaper path would still have a node open under it. The visited list
+    holds each worker's expansions in turn, not one global order.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, workers=None,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.expansions = 0
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+
+    def searching(self):
+        environment = self.Env
+        workers = self.workers
+        self.heuristic = teleport_heuristic(environment, self.euclidean_cost)  # rebuilt if the map was edited
+        start, goal = environment.to_index(self.s_start), environment.to_index(self.s_goal)
+        blocks = []
+        processes = []
+        try:
+            map_spec, adjacency_specs = share_map(environment, self.euclidean_cost, blocks)
+            shm, parent_spec = share_array(np.full(environment.n_cells, -1, dtype=np.int64))
+            blocks.append(shm)
+            parent = np.ndarray(environment.n_cells, dtype=np.int64, buffer=shm.buf)
+
+            incumbent = mp.Value('d', math.inf)
+            sent = mp.Array('q', workers, lock=False)
+            received = mp.Array('q', workers, lock=False)
+            idle = mp.Array('b', workers, lock=False)
+            done = mp.Event()
+            inboxes = [mp.Queue() for _ in range(workers)]
+            results = mp.Queue()
+
+            # The start is sent to its owner like any other node.
+            sent[0] += 1
+            inboxes[owner(start, workers)].put([(self.get_h(self.s_start, self.s_goal), 0, start, start)])
+            for rank in range(workers):
+                process = mp.Process(
+                    target=_search_worker,
+                    args=(rank, workers, (map_spec, adjacency_specs, parent_spec), goal, self.euclidean_cost,
+                          self.batch_size, inboxes, results, incumbent, sent, received, idle, done),
+                    daemon=True,
+                )
+                process.start()
+                processes.append(process)
+
+            while not _terminated(sent, received, idle):
+                time.sleep(POLL_INTERVAL)
+                if not all(p.is_alive() for p in processes):
+                    raise RuntimeError("an HDA* worker exited early")
+            done.set()
+
+            expanded = sorted((results.get() for _ in processes), key=lambda r: r[0])
+            for process in processes:
+                process.join()
+            visited = np.concatenate([array for _, array, _ in expanded])
+            self.expansions = len(visited)
+            visited = [environment.to_cell(int(idx)) for idx in visited]
+            if self.stats is not None:
+                self.collect_stats(visited, [counts for _, _, counts in expanded])
+
+            if incumbent.value == math.inf:
+                raise KeyError(self.s_goal)
+            path = [goal]
+            while path[-1] != start:
+                path.append(int(parent[path[-1]]))
+            path = [environment.to_cell(idx) for idx in reversed(path)]
+            return self.fill_path(path), visited
+        finally:
+            parent = None  # release the view before its block closes
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    def collect_stats(self, visited, worker_counts):
+        """
+        Add the workers' counters to `stats`. Expansions are replayed in
+        the order of the visited list once the workers are done, so
+        `on_expand` sees every cell but not while the search runs; the
+        peak open list is the largest one any single worker held.
+        """
+        stats = self.stats
+        for counts in worker_counts:
+            pushes, pops, stale, generated, peak = counts
+            stats.heap_pushes += pushes
+            stats.heap_pops += pops
+            stats.stale_pops += stale
+            stats.neighbor_generations += generated
+            stats.peak_open = max(stats.peak_open, peak)
+        teleports = self.teleports
+        for s in visited:
+            stats.expand(s)
+            if s in teleports:
+                stats.teleport_uses += 1
+
+    def get_h(self, s_from, s_to):
+        return self.heuristic.estimate(s_from, s_to)
+
+
+def speedup(environment, queries, worker_counts=DEFAULT_WORKER_COUNTS, euclidean_cost=True,
+            batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Wall time of the queries for each worker count, with the speedup over
+    the first count, as [(workers, seconds, speedup, expansions)].
+    """
+    curve = []
+    for workers in worker_counts:
+        t0 = time.perf_counter()
+        expansions = 0
+        for start, goal in queries:
+            agent = HDAStarAgent(start, goal, environment, euclidean_cost, workers, batch_size)
+            try:
+                agent.searching()
+            except KeyError:
+                pass
+            expansions += agent.expansions
+        elapsed = time.perf_counter() - t0
+        base = curve[0][1] if curve else elapsed
+        curve.append((workers, elapsed, base / elapsed, expansions))
+        print(f"{workers:>3} workers {elapsed:9.3f}s speedup {base / elapsed:5.2f}x {expansions:>10} expansions")
+    return curve
+
+
+def main(argv=None):
+    from benchmark import procedural_map, solvable_queries
+
+    parser = argparse.ArgumentParser(description="Measure HDA* speedup across worker counts.")
+    parser.add_argument("--map", help="map name in the Maps folder (default: a procedural map)")
+    parser.add_argument("--size", type=int, default=512, help="side length of the procedural map")
+    parser.add_argument("--density", type=float, default=0.25)
+    parser.add_argument("--workers", type=int, nargs="*", default=list(DEFAULT_WORKER_COUNTS))
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--unit-cost", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the curve here as JSON")
+    args = parser.parse_args(argv)
+
+    if args.map:
+        environment = Env(args.map, use_random_teleports=False)
+    else:
+        environment = procedural_map(args.size, args.density, seed=args.seed)
+    queries = solvable_queries(environment, args.queries, args.seed)
+    print(f"{environment.x_range}x{environment.y_range} map, {len(queries)} queries, "
+          f"{os.cpu_count()} CPUs available")
+    curve = speedup(environment, queries, args.workers, not args.unit_cost, args.batch_size)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump([dict(zip(("workers", "seconds", "speedup", "expansions"), row)) for row in curve], f, indent=2)
+        print(f"Speedup curve written to {args.out}.")
+
+
+if __name__ == "__main__":
+    main()
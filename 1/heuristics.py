@@ -0,0 +1,169 @@
+import weakref
+
+# Per-target tables kept per heuristic before the oldest is dropped.
+MAX_TABLES = 64
+
+_shared = weakref.WeakKeyDictionary()
+
+
+def octile(s_from, s_to, euclidean_cost=True):
+    """Cost of the best obstacle-free 8-connected path: straight 1, diagonal 1.4."""
+    dx = abs(s_to[0] - s_from[0])
+    dy = abs(s_to[1] - s_from[1])
+    diagonal = 1.4 if euclidean_cost else 1.0
+    return max(dx, dy) + (diagonal - 1) * min(dx, dy)
+
+
+class TeleportHeuristic:
+    """
+    Admissible, consistent heuristic for maps with teleports.
+
+    h(s, t) = min(octile(s, t), min over endpoints p of octile(s, p) + D_t(p))
+
+    where D_t(p) is a lower bound on the cost from teleport endpoint p to t.
+    The lower bounds between endpoints (walking at octile cost or taking a
+    teleport at its drawn cost, any number of hops) are computed once per
+    Env with Floyd-Warshall; a target only adds an O(P) pass over them,
+    after which the endpoints that cannot lower its bound are dropped.
+
+    A search toward one goal should take `toward(goal)` once and call that:
+    it memoizes the bound per cell, so each cell costs one pass over the
+    kept endpoints however often it is generated. The heuristic holds no
+    reference to the Env, so the per-Env cache below never keeps one alive.
+    """
+
+    def __init__(self, environment, euclidean_cost=True):
+        self.euclidean_cost = euclidean_cost
+        cache = environment.adjacency(euclidean_cost)
+
+        nodes = []
+        for a, b in environment.teleports.items():
+            for s in (a, b):
+                if s not in nodes:
+                    nodes.append(s)
+        self.nodes = nodes
+
+        m = len(nodes)
+        dist = [[octile(p, q, euclidean_cost) for q in nodes] for p in nodes]
+        position = {s: i for i, s in enumerate(nodes)}
+        for a, b in environment.teleports.items():
+            if not environment.cells[environment.to_index(a)]:
+                i, j = position[a], position[b]
+                dist[i][j] = min(dist[i][j], cache.teleport_cost(a, b))
+        for k in range(m):
+            dk = dist[k]
+            for i in range(m):
+                di = dist[i]
+                dik = di[k]
+                for j in range(m):
+                    if dik + dk[j] < di[j]:
+                        di[j] = dik + dk[j]
+        self.dist = dist
+
+        self.goal_tables = {}
+        self.source_tables = {}
+
+    def _remember(self, tables, key, table):
+        if len(tables) >= MAX_TABLES:
+            tables.pop(next(iter(tables)))
+        tables[key] = table
+        return table
+
+    def _prune(self, table, anchor):
+        """
+        Drop the endpoints of a goal or source table that never give the
+        minimum: those whose bound is no better than the octile distance to
+        the anchor, and those another kept endpoint dominates (octile is a
+        metric, so bound(p) >= octile(p, q) + bound(q) rules p out).
+        """
+        ec = self.euclidean_cost
+        kept = []
+        for p, bound in sorted(table, key=lambda entry: entry[1]):
+            if bound >= octile(p, anchor, ec):
+                continue
+            if all(bound < octile(p, q, ec) + other for q, other in kept):
+                kept.append((p, bound))
+        return kept
+
+    def goal_table(self, goal):
+        """[(endpoint, lower bound endpoint -> goal)] for one goal."""
+        table = self.goal_tables.get(goal)
+        if table is None:
+            direct = [octile(q, goal, self.euclidean_cost) for q in self.nodes]
+            table = [
+                (p, min(d + g for d, g in zip(row, direct)))
+                for p, row in zip(self.nodes, self.dist)
+            ]
+            table = self._remember(self.goal_tables, goal, self._prune(table, goal))
+        return table
+
+    def source_table(self, source):
+        """[(endpoint, lower bound source -> endpoint)] for one source."""
+        table = self.source_tables.get(source)
+        if table is None:
+            direct = [octile(source, p, self.euclidean_cost) for p in self.nodes]
+            m = len(self.nodes)
+            table = [
+                (q, min(direct[i] + self.dist[i][j] for i in range(m)))
+                for j, q in enumerate(self.nodes)
+            ]
+            table = self._remember(self.source_tables, source, self._prune(table, source))
+        return table
+
+    def toward(self, goal):
+        """`estimate(s, goal)` as a function of s, memoized for one search."""
+        return self._memoized(goal, self.goal_table(goal) if self.nodes else [])
+
+    def away_from(self, source):
+        """`estimate_from(source, s)` as a function of s, memoized for one search."""
+        return self._memoized(source, self.source_table(source) if self.nodes else [])
+
+    def _memoized(self, anchor, table):
+        ec = self.euclidean_cost
+        memo = {}
+
+        def h(s):
+            value = memo.get(s)
+            if value is None:
+                value = octile(s, anchor, ec)
+                for p, bound in table:
+                    via = octile(s, p, ec) + bound
+                    if via < value:
+                        value = via
+                memo[s] = value
+            return value
+
+        return h
+
+    def estimate(self, s_from, s_to):
+        """Lower bound on the cost from s_from to s_to."""
+        h = octile(s_from, s_to, self.euclidean_cost)
+        if self.nodes:
+            for p, bound in self.goal_table(s_to):
+                via = octile(s_from, p, self.euclidean_cost) + bound
+                if via < h:
+                    h = via
+        return h
+
+    def estimate_from(self, source, s_to):
+        """Same bound as `estimate`, cached on the source side instead."""
+        h = octile(source, s_to, self.euclidean_cost)
+        if self.nodes:
+            for q, bound in self.source_table(source):
+                via = bound + octile(q, s_to, self.euclidean_cost)
+                if via < h:
+                    h = via
+        return h
+
+
+def teleport_heuristic(environment, euclidean_cost=True):
+    """
+    TeleportHeuristic shared by every agent on the Env, rebuilt after the
+    map is edited.
+    """
+    per_env = _shared.setdefault(environment, {})
+    version, heuristic = per_env.get(euclidean_cost, (None, None))
+    if version != environment.version:
+        heuristic = TeleportHeuristic(environment, euclidean_cost)
+        per_env[euclidean_cost] = (environment.version, heuristic)
+    return heuristic
@@ -0,0 +1,320 @@
+import heapq
+import math
+
+from adjacency import step_cost
+from agent import AbstractSearchAgent
+from heuristics import teleport_heuristic
+
+DEFAULT_CLUSTER_SIZE = 16
+
+
+class Hierarchy:
+    """
+    HPA* abstraction of an Env.
+
+    The grid is cut into cluster_size x cluster_size clusters. Wherever a
+    move crosses a cluster border, transition cells are placed on both
+    sides (the middle of a short opening, both ends of a long one, plus any
+    diagonal-only crossing), and teleport endpoints become abstract nodes
+    joined by their teleport edge. Inside every cluster the distances
+    between its abstract nodes are computed once.
+
+    Map edits only mark the clusters around the edited cells dirty; the
+    borders and intra-cluster distances of those clusters are rebuilt before
+    the next query.
+    """
+
+    def __init__(self, environment, euclidean_cost=True, cluster_size=DEFAULT_CLUSTER_SIZE):
+        self.env = environment
+        self.euclidean_cost = euclidean_cost
+        self.size = cluster_size
+        self.n_cx = -(-environment.x_range // cluster_size)
+        self.n_cy = -(-environment.y_range // cluster_size)
+
+        self.transitions = {}  # border key -> [(a, b, cost)] crossing edges
+        self.nodes = {}        # cluster -> set of abstract cells
+        self.intra = {}        # cluster -> {a: {b: cost}}
+        self.inter = {}        # abstract cell -> {cell across a border: cost}
+        self.dirty = {(i, j) for i in range(self.n_cx) for j in range(self.n_cy)}
+        self.known_teleports = dict(environment.teleports)
+        self.moves = [(dx, dy, step_cost(dx, dy, euclidean_cost)) for dx, dy in environment.motions]
+        self.rebuilt = 0
+
+        environment.add_listener(self.on_map_change)
+
+    # --- geometry ----------------------------------------------------------
+
+    def cluster(self, s):
+        return s[0] // self.size, s[1] // self.size
+
+    def bounds(self, c):
+        x0, y0 = c[0] * self.size, c[1] * self.size
+        return x0, min(x0 + self.size, self.env.x_range), y0, min(y0 + self.size, self.env.y_range)
+
+    def free(self, x, y):
+        env = self.env
+        return 0 <= x < env.x_range and 0 <= y < env.y_range and not env.cells[x * env.y_range + y]
+
+    def border_keys(self, c):
+        """Keys of every border whose crossings can touch cluster c."""
+        i, j = c
+        keys = []
+        for jj in (j - 1, j, j + 1):
+            keys.append(('v', i, jj))
+            keys.append(('v', i + 1, jj))
+        for ii in (i - 1, i, i + 1):
+            keys.append(('h', ii, j))
+            keys.append(('h', ii, j + 1))
+        return keys
+
+    # --- building ----------------------------------------------------------
+
+    def scan_border(self, key):
+        """
+        Crossing edges of one border segment. 'v', k, j is the line between
+        cluster columns k-1 and k along the rows of cluster row j (diagonals
+        may end one row further); 'h', i, k the line between cluster rows
+        k-1 and k along the columns of cluster column i, excluding diagonals
+        that also cross a column line (those belong to the 'v' keys).
+        """
+        kind, a, b = key
+        free = self.free
+        crossings = []
+        if kind == 'v':
+            k, j = a, b
+            x0, x1 = k * self.size - 1, k * self.size
+            lo, hi = j * self.size, min((j + 1) * self.size, self.env.y_range)
+            if k <= 0 or x1 >= self.env.x_range or j < 0 or lo >= hi:
+                return crossings
+            line = [((x0, y), (x1, y)) for y in range(lo, hi)]
+            diagonal = [((x0, y), (x1, y + d)) for y in range(lo, hi) for d in (-1, 1)]
+            blocked_corner = lambda p, q: not free(q[0], p[1]) and not free(p[0], q[1])
+        else:
+            i, k = a, b
+            y0, y1 = k * self.size - 1, k * self.size
+            lo, hi = i * self.size, min((i + 1) * self.size, self.env.x_range)
+            if k <= 0 or y1 >= self.env.y_range or i < 0 or lo >= hi:
+                return crossings
+            line = [((x, y0), (x, y1)) for x in range(lo, hi)]
+            diagonal = [((x, y0), (x + d, y1)) for x in range(lo, hi) for d in (-1, 1)
+                        if lo <= x + d < hi]
+            blocked_corner = lambda p, q: not free(q[0], p[1]) and not free(p[0], q[1])
+
+        # Straight openings: one transition for a short run, both ends of a long one.
+        run = []
+        for p, q in line + [(None, None)]:
+            if p is not None and free(*p) and free(*q):
+                run.append((p, q))
+                continue
+            if run:
+                picks = [run[len(run) // 2]] if len(run) < 6 else [run[0], run[-1]]
+                crossings.extend(picks)
+                run = []
+        # Diagonal crossings matter only when both corner cells are blocked.
+        for p, q in diagonal:
+            if free(*p) and free(*q) and blocked_corner(p, q):
+                crossings.append((p, q))
+
+        return [(p, q, step_cost(q[0] - p[0], q[1] - p[1], self.euclidean_cost)) for p, q in crossings]
+
+    def cluster_dijkstra(self, source, targets=None):
+        """
+        Distances and parents from `source` to cells of its own cluster,
+        moving only inside the cluster and without teleports.
+        """
+        x0, x1, y0, y1 = self.bounds(self.cluster(source))
+        cells, y_range = self.env.cells, self.env.y_range
+        dist = {source: 0}
+        parent = {source: source}
+        que = [(0, source)]
+        remaining = set(targets) if targets is not None else None
+        while que:
+            d, s = heapq.heappop(que)
+            if d > dist[s]:
+                continue
+            if remaining is not None:
+                remaining.discard(s)
+                if not remaining:
+                    break
+            for dx, dy, step in self.moves:
+                nx, ny = s[0] + dx, s[1] + dy
+                if x0 <= nx < x1 and y0 <= ny < y1 and not cells[nx * y_range + ny]:
+                    nd = d + step
+                    if nd < dist.get((nx, ny), math.inf):
+                        dist[(nx, ny)] = nd
+                        parent[(nx, ny)] = s
+                        heapq.heappush(que, (nd, (nx, ny)))
+        return dist, parent
+
+    def rebuild(self):
+        """Rebuild borders, nodes and intra-cluster distances of dirty clusters."""
+        if not self.dirty:
+            return
+        keys = set()
+        for c in self.dirty:
+            keys.update(self.border_keys(c))
+        touched = set(self.dirty)
+        for key in keys:
+            for a, b, _ in self.transitions.get(key, []):
+                touched.update((self.cluster(a), self.cluster(b)))
+            self.transitions[key] = self.scan_border(key)
+            for a, b, _ in self.transitions[key]:
+                touched.update((self.cluster(a), self.cluster(b)))
+
+        teleport_cells = {}
+        for a, b in self.env.teleports.items():
+            for s in (a, b):
+                teleport_cells.setdefault(self.cluster(s), set()).add(s)
+
+        for c in touched:
+            if not (0 <= c[0] < self.n_cx and 0 <= c[1] < self.n_cy):
+                continue
+            for s in self.nodes.get(c, ()):
+                self.inter.pop(s, None)
+            nodes = {s for s in teleport_cells.get(c, ()) if self.free(*s)}
+            for key in self.border_keys(c):
+                for a, b, cost in self.transitions.get(key, []):
+                    for p, q in ((a, b), (b, a)):
+                        if self.cluster(p) == c:
+                            nodes.add(p)
+                            self.inter.setdefault(p, {})[q] = cost
+            self.nodes[c] = nodes
+            intra = {}
+            for s in nodes:
+                dist, _ = self.cluster_dijkstra(s, nodes)
+                intra[s] = {t: dist[t] for t in nodes if t != s and t in dist}
+            self.intra[c] = intra
+            self.rebuilt += 1
+        self.dirty.clear()
+
+    def on_map_change(self, changed):
+        for s in changed:
+            i, j = self.cluster(s)
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    c = (i + di, j + dj)
+                    if 0 <= c[0] < self.n_cx and 0 <= c[1] < self.n_cy:
+                        x0, x1, y0, y1 = self.bounds(c)
+                        if x0 - 1 <= s[0] <= x1 and y0 - 1 <= s[1] <= y1:
+                            self.dirty.add(c)
+            for exit_cell in (self.known_teleports.pop(s, None), self.env.teleports.get(s)):
+                if exit_cell is not None:
+                    self.dirty.add(self.cluster(exit_cell))
+            if s in self.env.teleports:
+                self.known_teleports[s] = self.env.teleports[s]
+
+    def abstract_neighbors(self, s):
+        """(cell, cost, kind) abstract edges out of an abstract node."""
+        edges = [(t, cost, 'intra') for t, cost in self.intra.get(self.cluster(s), {}).get(s, {}).items()]
+        edges.extend((t, cost, 'step') for t, cost in self.inter.get(s, {}).items())
+        exit_cell = self.env.teleports.get(s)
+        if exit_cell is not None and self.free(*s):
+            edges.append((exit_cell, self.env.adjacency(self.euclidean_cost).teleport_cost(s, exit_cell), 'teleport'))
+        return edges
+
+
+def hierarchy(environment, euclidean_cost=True, cluster_size=DEFAULT_CLUSTER_SIZE):
+    """
+    Hierarchy shared by every HPA* agent on the Env. It is kept on the Env
+    itself: the Hierarchy refers back to the Env, so a weak-keyed cache
+    entry would keep its own key alive.
+    """
+    per_env = environment.hierarchies
+    key = (euclidean_cost, cluster_size)
+    if key not in per_env:
+        per_env[key] = Hierarchy(environment, euclidean_cost, cluster_size)
+    return per_env[key]
+
+
+class HPAStarAgent(AbstractSearchAgent):
+    """
+    Hierarchical A*: the query is answered on the small abstract graph of
+    the map's Hierarchy (start and goal are linked into their clusters just
+    for this query), then each abstract edge on the result is refined into
+    grid moves inside its cluster. Paths are near-optimal, not optimal.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, cluster_size=DEFAULT_CLUSTER_SIZE):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.hierarchy = hierarchy(environment, euclidean_cost, cluster_size)
+        self.heuristic = teleport_heuristic(environment, euclidean_cost)
+
+    def get_h(self, s_from, s_to):
+        return self.heuristic.estimate(s_from, s_to)
+
+    def searching(self):
+        h = self.hierarchy
+        h.rebuild()
+        start, goal = self.s_start, self.s_goal
+        c_start, c_goal = h.cluster(start), h.cluster(goal)
+
+        start_edges, _ = h.cluster_dijkstra(start, h.nodes[c_start] | {goal})
+        goal_edges, _ = h.cluster_dijkstra(goal, h.nodes[c_goal] | {start})
+        into_goal = {s: goal_edges[s] for s in h.nodes[c_goal] if s in goal_edges}
+
+        seened = []
+        stats = self.stats
+        heappush, heappop = self.heappush, self.heappop
+        g = {start: 0}
+        parent = {start: (start, None)}
+        closed = set()
+        que = [(self.get_h(start, goal), 0, start)]
+        while que:
+            f, cost, s = heappop(que)
+            if s in closed:
+                if stats is not None:
+                    stats.stale_pops += 1
+                continue
+            closed.add(s)
+            seened.append(s)
+            if stats is not None:
+                stats.expand(s)
+            if s == goal:
+                break
+            if s == start:
+                edges = [(t, d, 'intra') for t, d in start_edges.items()
+                         if t != start and (t in h.nodes[c_start] or t == goal)]
+                if start in h.nodes[c_start]:
+                    edges.extend(e for e in h.abstract_neighbors(start) if e[2] != 'intra')
+            else:
+                edges = h.abstract_neighbors(s)
+                if s in into_goal:
+                    edges.append((goal, into_goal[s], 'intra'))
+            if stats is not None:
+                stats.neighbor_generations += len(edges)
+            for t, d, kind in edges:
+                nd = cost + d
+                if nd < g.get(t, math.inf):
+                    g[t] = nd
+                    parent[t] = (s, kind)
+                    heappush(que, (nd + self.get_h(t, goal), nd, t))
+
+        if goal not in closed:
+            raise KeyError(goal)
+        self.abstract_path = [goal]
+        kinds = []
+        while self.abstract_path[-1] != start:
+            s, kind = parent[self.abstract_path[-1]]
+            kinds.append(kind)
+            self.abstract_path.append(s)
+        self.abstract_path.reverse()
+        kinds.reverse()
+        return self.extract_path(kinds), seened
+
+    def refine(self, a, b, kind):
+        """Grid cells from a (exclusive) to b (inclusive) for one abstract edge."""
+        if kind != 'intra':
+            return [b]
+        _, parent = self.hierarchy.cluster_dijkstra(a, [b])
+        cells = [b]
+        while cells[-1] != a:
+            cells.append(parent[cells[-1]])
+        cells.pop()
+        cells.reverse()
+        return cells
+
+    def extract_path(self, kinds=None):
+        path = [self.s_start]
+        for (a, b), kind in zip(zip(self.abstract_path, self.abstract_path[1:]), kinds):
+            path.extend(self.refine(a, b, kind))
+        return self.fill_path(path)
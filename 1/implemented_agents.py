@@ -1,143 +1,653 @@
 from agent import AbstractSearchAgent
+from collections import deque
+from frontier import best_first
+from heuristics import teleport_heuristic
 import heapq
 import math
 
+import numpy as np
+
+DEFAULT_TABLE_SIZE = 1 << 16
+
 class BFSAgent(AbstractSearchAgent):
-    def searching(self):
-        que = [(self.s_start,self.s_start,0)]
+    def searching(self, wavefront=False):
+        """
+        Breadth-first search. Cells are marked when first discovered, so each
+        cell enters the queue once. With `wavefront=True` (unit cost only)
+        the layers are expanded with NumPy instead, see `distance_field`.
+        """
+        if wavefront:
+            return self.searching_wavefront()
+
+        que = deque([self.s_start])
+        self.PARENT[self.s_start] = self.s_start
+        self.COST[self.s_start] = 0
+        self.VISITED.add(self.s_start)
         seened = []
-        while len(que):
-            point,parent,cost = que.pop(0)
-            if point in self.VISITED:
-                continue
-            self.PARENT[point] = parent
-            self.COST[point] = cost
-            self.VISITED.add(point)
+        stats = self.stats
+        while que:
+            point = que.popleft()
             seened.append(point)
+            if stats is not None:
+                stats.expand(point, len(que) + 1)
             if point == self.s_goal:
                 break
+            cost = self.COST[point]
+            costs = self.NEIGHBOR_COSTS[point]
             for neighbor in self.get_neighbors(point):
-                que.append((neighbor,point,cost+self.NEIGHBOR_COSTS[point][neighbor]))
+                if neighbor in self.VISITED:
+                    continue
+                self.VISITED.add(neighbor)
+                self.PARENT[neighbor] = point
+                self.COST[neighbor] = cost + costs[neighbor]
+                if neighbor == self.s_goal:
+                    que.clear()
+                    seened.append(neighbor)
+                    break
+                que.append(neighbor)
 
-        return self.extract_path(),seened
+        return self.extract_path(), seened
 
+    def distance_field(self, source=None, stop_at=None):
+        """
+        Hop distance of every cell from `source` (default s_start), -1 where
+        unreachable, as an (x_range, y_range) int32 array.
 
-class BiIDDFSAgent(AbstractSearchAgent):
-    def limit_dfs(self,node,visited,goal,parents,costs):
-        point,parent,cost = node
-        if cost > self.limit:
-            return None
-        visited.append(point)
-        parents[point] = parent
-        costs[point] = costs[parent] + 1
-        if point == goal:
-            return cost
-        for neighbor in self.get_neighbors(point):
-            if neighbor not in visited:
-                ret = self.limit_dfs((neighbor,point,cost+1),visited,goal,parents,costs)
-                if ret:
-                    return ret
-                
-
-
-    def extract_path_re(self,start,parent,costs_2):
-        path = []
-        s = start
-        l_cost = self.COST[start]
-        while s != self.s_goal:
-            path.append(s)
-            s = parent[s]
-            self.COST[s] = l_cost + 1
-        path.append(self.s_goal)
-        self.COST[self.s_goal] = l_cost + 1
-        return path
+        A whole BFS layer is expanded at once: the layer's flat cell indices
+        are shifted by each motion offset (and mapped through the teleport
+        table), then filtered against the occupancy grid and the cells
+        already reached. Each layer costs O(layer size), not O(map size).
+        Stops early once `stop_at` is reached. As in `get_neighbors`, grid
+        moves only enter free cells but a teleport exit is taken even when
+        it lies on an obstacle.
+        """
+        env = self.Env
+        X, Y = env.x_range, env.y_range
+        source = self.s_start if source is None else source
+        free = env.grid.ravel() == 0
+        dist = np.full(env.n_cells, -1, dtype=np.int32)
 
-    def extract_path(self,end,parent):
-        path = []
-        s = end
+        tele_src = np.array([env.to_index(a) for a in self.teleports], dtype=np.int64)
+        tele_dst = np.array([env.to_index(b) for b in self.teleports.values()], dtype=np.int64)
+        tele_map = np.full(env.n_cells, -1, dtype=np.int64)
+        tele_map[tele_src] = tele_dst
+        stop_idx = None if stop_at is None else env.to_index(stop_at)
+
+        frontier = np.array([env.to_index(source)], dtype=np.int64)
+        dist[frontier] = 0
+        d = 0
+        while len(frontier) and (stop_idx is None or dist[stop_idx] < 0):
+            xs, ys = np.divmod(frontier, Y)
+            found = []
+            for dx, dy in env.motions:
+                ok = (xs + dx >= 0) & (xs + dx < X) & (ys + dy >= 0) & (ys + dy < Y)
+                found.append(frontier[ok] + (dx * Y + dy))
+            exits = tele_map[frontier]
+            exits = exits[exits >= 0]
+
+            nxt = np.concatenate(found)
+            nxt = nxt[free[nxt] & (dist[nxt] < 0)]
+            nxt = np.unique(np.concatenate([nxt, exits[dist[exits] < 0]]))
+            d += 1
+            dist[nxt] = d
+            frontier = nxt
+
+        return dist.reshape(X, Y)
+
+    def searching_wavefront(self):
+        """
+        Unit-cost BFS through `distance_field`; the path is read back from
+        the goal by stepping to any predecessor one layer closer.
+        """
+        if self.euclidean_cost:
+            raise ValueError("wavefront BFS needs unit costs (euclidean_cost=False)")
+
+        dist = self.distance_field(stop_at=self.s_goal)
+        if dist[self.s_goal] < 0:
+            raise KeyError(self.s_goal)
+
+        sources = {}
+        for a, b in self.teleports.items():
+            sources.setdefault(b, []).append(a)
+
+        env = self.Env
+        s = self.s_goal
         while s != self.s_start:
-            path.append(s)
-            s = parent[s]
-        path.append(self.s_start)
-        path.reverse()
-        return path
+            k = dist[s]
+            # Predecessors by the same rules as get_neighbors: any cell whose
+            # teleport leads to s, and any cell next to s if s is free.
+            preds = list(sources.get(s, ()))
+            if not env.cells[env.to_index(s)]:
+                for dx, dy in self.u_set:
+                    u = (s[0] - dx, s[1] - dy)
+                    if 0 <= u[0] < env.x_range and 0 <= u[1] < env.y_range:
+                        preds.append(u)
+            for u in preds:
+                if dist[u] == k - 1:
+                    self.PARENT[s] = u
+                    self.COST[s] = float(k)
+                    s = u
+                    break
+            else:
+                raise RuntimeError(f"no cell at distance {k - 1} leads to {s}; the distance field is inconsistent")
+        self.COST[self.s_start] = 0
 
+        order = np.argsort(dist, axis=None, kind='stable')
+        order = order[dist.ravel()[order] >= 0]
+        xs, ys = np.divmod(order, self.Env.y_range)
+        seened = list(zip(xs.tolist(), ys.tolist()))
+        self.VISITED = set(seened)
+        return self.extract_path(), seened
+
+
+class BiIDDFSAgent(AbstractSearchAgent):
+    """
+    Bidirectional iterative deepening.
+
+    The goal side keeps its BFS frontier over predecessor edges between
+    iterations (only the last two layers, enough to tell new cells from old
+    ones because moves and teleport pairs between free cells are symmetric).
+    The start side reruns a depth-limited DFS over successor edges with an
+    explicit stack each iteration and looks its deepest cells up in the goal
+    frontier set. Depths grow one side at a time, so the first meeting gives
+    a path with the fewest moves; a DFS from the goal over predecessor edges
+    then finds the second half.
+
+    Like IDAStarAgent, the DFS holds the current path plus a transposition
+    table of at most `table_size` cells with the lowest depth each was
+    reached at and the iteration that last explored it there, so memory is
+    O(depth + table_size) however large the map. `iterations` keeps the
+    expansions of each DFS; the visited list returned is the last DFS
+    followed by the goal side's layers.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, table_size=DEFAULT_TABLE_SIZE):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.table_size = table_size
+        self.table = {}
+        self.iterations = []
+
+    def limit_dfs(self, root, limit, targets, visited, edges=None):
+        """
+        Depth-limited DFS from root without recursion, following `edges`
+        (successors by default). Returns the path to the first cell at depth
+        `limit` that is in `targets`, or None.
+
+        A cell is skipped when the table has it at a lower depth, or at the
+        same depth in this pass. Past the table's size, a move to a cell
+        that an earlier path cell could reach directly is still skipped:
+        such a walk is never a fewest-moves path, and every cell at hop
+        distance `limit` keeps one that is.
+        """
+        edges = edges or self.successors
+        stats = self.stats
+        table = self.table
+        iteration = len(self.iterations)
+        path = [root]
+        on_path = {root}
+        reach = {}  # cell -> path cells (all but the last) with an edge to it
+        stack = [None]  # per path cell: its children still to try
+        while path:
+            point = path[-1]
+            children = stack[-1]
+            if children is None:
+                visited.append(point)
+                if stats is not None:
+                    stats.expand(point, len(path) + len(table))
+                depth = len(path) - 1
+                if depth == limit:
+                    if point in targets:
+                        return list(path)
+                    children = []
+                else:
+                    neighbors = edges(point)
+                    children = []
+                    for n in reversed(neighbors):
+                        if n in on_path or reach.get(n):
+                            continue
+                        best, explored = table.get(n, (limit + 1, -1))
+                        if depth + 1 > best or (depth + 1 == best and explored == iteration):
+                            continue
+                        children.append(n)
+                    for n in neighbors:
+                        reach[n] = reach.get(n, 0) + 1
+                stack[-1] = children
+            if children:
+                nxt = children.pop()
+                if nxt in table or len(table) < self.table_size:
+                    table[nxt] = (len(path), iteration)
+                path.append(nxt)
+                on_path.add(nxt)
+                stack.append(None)
+                continue
+
+            # Done with this cell: take it and its edges off the path.
+            stack.pop()
+            path.pop()
+            on_path.discard(point)
+            if len(path) == limit:
+                continue  # a cell at the limit added no edges
+            for n in edges(point):
+                if reach[n] == 1:
+                    del reach[n]
+                else:
+                    reach[n] -= 1
+        return None
+
+    def extract_path(self, meet_path=None, goal_path=None):
+        """
+        Join start -> meet and meet -> goal and fill PARENT/COST along it.
+        """
+        return self.fill_path(meet_path + goal_path[1:])
 
     def searching(self):
-        self.limit = 1
-        all_visited = []
+        self.TELEPORT_SOURCES = self.reverse_teleports()
+        goal_visited = []
+        back_prev, back_layer = set(), {self.s_goal}
+        forward_limit, self.limit = 0, 0
         while True:
             visited = []
-            parents = {}
-            costs = {self.s_start:0}
-            self.limit_dfs((self.s_start,self.s_start,0),visited,self.s_goal,parents,costs)
-            
-
-            visited_2 = []
-            parents_2 = {}
-            costs_2 = {self.s_goal:0}
-            self.limit_dfs((self.s_goal,self.s_goal,0),visited_2,self.s_start,parents_2,costs_2)
-            all_visited.extend(visited)
-            all_visited.extend(visited_2)
-            intersection = list(set(visited)&set(visited_2))
-            if len(intersection)>0:
+            meet_path = self.limit_dfs(self.s_start, forward_limit, back_layer, visited)
+            self.iterations.append(len(visited))
+            if meet_path:
                 break
-            self.limit+=1
-        
-        self.COST = costs
-        return self.extract_path(intersection[0],parents) + self.extract_path_re(intersection[0],parents_2,costs_2),all_visited
-        
-            
-        
+            if forward_limit == self.limit:
+                forward_limit += 1
+                continue
+
+            next_layer = set()
+            for point in back_layer:
+                goal_visited.append(point)
+                if self.stats is not None:
+                    self.stats.expand(point, len(back_layer))
+                for neighbor in self.predecessors(point):
+                    if neighbor not in back_layer and neighbor not in back_prev:
+                        next_layer.add(neighbor)
+            if not next_layer:
+                raise KeyError(self.s_goal)
+            back_prev, back_layer = back_layer, next_layer
+            self.limit += 1
+
+        self.table.clear()  # depths from the start mean nothing from the meeting cell
+        goal_path = self.limit_dfs(self.s_goal, self.limit, {meet_path[-1]}, visited, self.predecessors)
+        if goal_path is None:
+            raise KeyError(self.s_goal)
+        goal_path.reverse()
+        return self.extract_path(meet_path, goal_path), visited + goal_visited
+
+
 class AStarAgent(AbstractSearchAgent):
+    # A frontier.FRONTIERS name or frontier class to search with instead of
+    # the built-in heapq loop; also settable per agent.
+    frontier = None
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, frontier=None):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        if frontier is not None:
+            self.frontier = frontier
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+
+    def goal_bound(self):
+        """h(s) toward s_goal for one search; subclasses with their own get_h override it too."""
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)  # rebuilt if the map was edited
+        return self.heuristic.toward(self.s_goal)
+
     def searching(self):
+        h = self.goal_bound()
+        if self.frontier is not None:
+            return best_first(self, self.frontier, h)
         que = [(0,0,self.s_start,self.s_start)]
         heapq.heapify(que)
         seened = []
+        stats = self.stats
+        heappush, heappop = self.heappush, self.heappop
         while len(que):
-            f,g,point,parent = heapq.heappop(que)
+            f,g,point,parent = heappop(que)
             if point in self.VISITED:
+                if stats is not None:
+                    stats.stale_pops += 1
                 continue
             self.PARENT[point] = parent
             self.COST[point] = g
             self.VISITED.add(point)
             seened.append(point)
+            if stats is not None:
+                stats.expand(point)
             if point == self.s_goal:
                 break
             for neighbor in self.get_neighbors(point):
                 if neighbor in self.teleports:
                     pass
                 n_cost = round(self.NEIGHBOR_COSTS[point][neighbor],2)
-                f = g + n_cost + self.get_h(neighbor,self.s_goal) 
-                heapq.heappush(que,(f,g+n_cost,neighbor,point))
+                f = g + n_cost + h(neighbor)
+                heappush(que,(f,g+n_cost,neighbor,point))
 
         return self.extract_path(),seened
     def get_h(self, s_from, s_to):
-        dx = s_to[0] - s_from[0]
-        dy = s_to[1] - s_from[1]
-        distance = math.sqrt(dx ** 2 + dy ** 2)
-        return distance
+        """
+        Octile distance, lowered through teleports where a portal shortcut
+        could be cheaper, so the estimate never exceeds the true cost.
+        """
+        return self.heuristic.estimate(s_from, s_to)
 
 
 class UCSAgent(AbstractSearchAgent):
+    # A frontier.FRONTIERS name or frontier class to search with instead of
+    # the built-in heapq loop; also settable per agent.
+    frontier = None
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, frontier=None):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        if frontier is not None:
+            self.frontier = frontier
+
     def searching(self):
+        if self.frontier is not None:
+            return best_first(self, self.frontier)
         que = [(0,self.s_start,self.s_start)]
         heapq.heapify(que)
         seened = []
+        stats = self.stats
+        heappush, heappop = self.heappush, self.heappop
         while len(que):
-            cost,point,parent = heapq.heappop(que)
+            cost,point,parent = heappop(que)
             if point in self.VISITED:
+                if stats is not None:
+                    stats.stale_pops += 1
                 continue
             self.PARENT[point] = parent
             self.COST[point] = cost
             self.VISITED.add(point)
             seened.append(point)
+            if stats is not None:
+                stats.expand(point)
             if point == self.s_goal:
                 break
             for neighbor in self.get_neighbors(point):
                 if neighbor in self.teleports:
                     pass
                 n_cost = round(self.NEIGHBOR_COSTS[point][neighbor],2)
-                heapq.heappush(que,(cost+n_cost,neighbor,point))
+                heappush(que,(cost+n_cost,neighbor,point))
 
         return self.extract_path(),seened
+
+
+class JPSAgent(AbstractSearchAgent):
+    """
+    Jump Point Search over the 8-connected grid.
+
+    Straight and diagonal runs are skipped in one step and only jump points
+    (cells with forced neighbors, the goal and teleport entrances) are pushed
+    on the open list. Teleport entrances are always jump points, and a cell
+    reached through a teleport is expanded in all 8 directions like the start.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+
+    def free(self, x, y):
+        return 0 <= x < self.Env.x_range and 0 <= y < self.Env.y_range \
+            and not self.Env.cells[x * self.Env.y_range + y]
+
+    def jump(self, x, y, dx, dy):
+        """
+        Walk from (x, y) along (dx, dy); return (jump point, steps) or None.
+        """
+        free = self.free
+        steps = 0
+        while True:
+            x += dx
+            y += dy
+            steps += 1
+            if not free(x, y):
+                return None
+            s = (x, y)
+            if s == self.s_goal or s in self.teleports:
+                return s, steps
+            if dx and dy:
+                if (free(x - dx, y + dy) and not free(x - dx, y)) or \
+                        (free(x + dx, y - dy) and not free(x, y - dy)):
+                    return s, steps
+                if self.jump(x, y, dx, 0) or self.jump(x, y, 0, dy):
+                    return s, steps
+            elif dx:
+                if (free(x + dx, y + 1) and not free(x, y + 1)) or \
+                        (free(x + dx, y - 1) and not free(x, y - 1)):
+                    return s, steps
+            else:
+                if (free(x + 1, y + dy) and not free(x + 1, y)) or \
+                        (free(x - 1, y + dy) and not free(x - 1, y)):
+                    return s, steps
+
+    def directions(self, s, direction):
+        """Pruned set of directions to jump in from s."""
+        if direction is None:
+            return self.u_set
+        x, y = s
+        dx, dy = direction
+        free = self.free
+        if dx and dy:
+            dirs = [(dx, 0), (0, dy), (dx, dy)]
+            if not free(x - dx, y):
+                dirs.append((-dx, dy))
+            if not free(x, y - dy):
+                dirs.append((dx, -dy))
+        elif dx:
+            dirs = [(dx, 0)]
+            if not free(x, y + 1):
+                dirs.append((dx, 1))
+            if not free(x, y - 1):
+                dirs.append((dx, -1))
+        else:
+            dirs = [(0, dy)]
+            if not free(x + 1, y):
+                dirs.append((1, dy))
+            if not free(x - 1, y):
+                dirs.append((-1, dy))
+        return dirs
+
+    def searching(self):
+        straight = 1.0
+        diagonal = 1.4 if self.euclidean_cost else 1.0
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+        h = self.heuristic.toward(self.s_goal)
+        que = [(0, 0, self.s_start, self.s_start, None)]
+        self.TELEPORTED = set()
+        seened = []
+        stats = self.stats
+        heappush, heappop = self.heappush, self.heappop
+        while len(que):
+            f, g, point, parent, direction = heappop(que)
+            if point in self.VISITED:
+                if stats is not None:
+                    stats.stale_pops += 1
+                continue
+            self.PARENT[point] = parent
+            self.COST[point] = g
+            self.VISITED.add(point)
+            if direction is None and point != self.s_start:
+                self.TELEPORTED.add(point)
+            seened.append(point)
+            if stats is not None:
+                stats.expand(point)
+            if point == self.s_goal:
+                break
+            for dx, dy in self.directions(point, direction):
+                found = self.jump(point[0], point[1], dx, dy)
+                if found is None:
+                    continue
+                s_next, steps = found
+                if s_next in self.VISITED:
+                    continue
+                n_cost = round(steps * (diagonal if dx and dy else straight), 2)
+                heappush(que, (g + n_cost + h(s_next),
+                               g + n_cost, s_next, point, (dx, dy)))
+            if point in self.teleports:
+                exit_cell = self.teleports[point]
+                if exit_cell not in self.VISITED:
+                    n_cost = round(self.NEIGHBOR_COSTS[point][exit_cell], 2)
+                    if stats is not None:
+                        stats.teleport_uses += 1
+                    heappush(que, (g + n_cost + h(exit_cell),
+                                   g + n_cost, exit_cell, point, None))
+
+        return self.extract_path(), seened
+
+    def extract_path(self):
+        """
+        Reconstruct the path through the jump points and fill in the cells
+        between them, so PARENT and COST cover every cell on the path.
+        """
+        jump_points = super().extract_path()
+        path = [jump_points[0]]
+        for a, b in zip(jump_points, jump_points[1:]):
+            if b in self.TELEPORTED:
+                path.append(b)
+                continue
+            dx = (b[0] > a[0]) - (b[0] < a[0])
+            dy = (b[1] > a[1]) - (b[1] < a[1])
+            cost = self.COST[a]
+            s = a
+            while s != b:
+                s_next = (s[0] + dx, s[1] + dy)
+                cost += self.NEIGHBOR_COSTS[s][s_next]
+                self.PARENT[s_next] = s
+                self.COST[s_next] = cost
+                path.append(s_next)
+                s = s_next
+        return path
+
+    def get_h(self, s_from, s_to):
+        return self.heuristic.estimate(s_from, s_to)
+
+
+class BidirectionalUCSAgent(AbstractSearchAgent):
+    """
+    Bidirectional Dijkstra over NEIGHBOR_COSTS.
+
+    One frontier grows from s_start over the edges, the other from s_goal
+    over the reversed edges (teleports included, with the cost of the
+    forward teleport). Frontier keys are g + potential, where the potential
+    is zero here and the balanced A* potential in the subclass, so the same
+    stopping rule holds for both: stop once the sum of the two heap tops is
+    at least the best meeting cost found so far.
+    """
+
+    def potential(self, s):
+        return 0
+
+    def searching(self):
+        self.TELEPORT_SOURCES = self.reverse_teleports()
+
+        if self.s_start == self.s_goal:
+            self.PARENT[self.s_start] = self.s_start
+            self.COST[self.s_start] = 0
+            return [self.s_start], [self.s_start]
+
+        self.PARENT_B = {}
+        self.VISITED_B = set()
+        dist_f = {self.s_start: 0}
+        dist_b = {self.s_goal: 0}
+        que_f = [(self.potential(self.s_start), 0, self.s_start, self.s_start)]
+        que_b = [(-self.potential(self.s_goal), 0, self.s_goal, self.s_goal)]
+        best = math.inf
+        meet = None
+        seened = []
+        stats = self.stats
+        heappush, heappop = self.heappush, self.heappop
+
+        while que_f and que_b:
+            if que_f[0][0] + que_b[0][0] >= best:
+                break
+            forward = que_f[0][0] <= que_b[0][0]
+            if forward:
+                que, visited, parents, dist, other = que_f, self.VISITED, self.PARENT, dist_f, dist_b
+            else:
+                que, visited, parents, dist, other = que_b, self.VISITED_B, self.PARENT_B, dist_b, dist_f
+
+            k, g, point, parent = heappop(que)
+            if point in visited:
+                if stats is not None:
+                    stats.stale_pops += 1
+                continue
+            visited.add(point)
+            if forward:
+                self.COST[point] = g
+            seened.append(point)
+            if stats is not None:
+                stats.expand(point)
+
+            if forward:
+                steps = [(s, self.NEIGHBOR_COSTS[point][s]) for s in self.successors(point)]
+            else:
+                steps = [(s, self.NEIGHBOR_COSTS[s][point]) for s in self.predecessors(point)]
+            for s_next, n_cost in steps:
+                g_next = g + round(n_cost, 2)
+                if s_next in other and g_next + other[s_next] < best:
+                    best = g_next + other[s_next]
+                    meet = (point, s_next) if forward else (s_next, point)
+                if s_next in visited or g_next >= dist.get(s_next, math.inf):
+                    continue
+                dist[s_next] = g_next
+                parents[s_next] = point
+                p = self.potential(s_next)
+                heappush(que, (g_next + (p if forward else -p), g_next, s_next, point))
+
+        if meet is None:
+            raise KeyError(self.s_goal)
+        return self.extract_path(meet), seened
+
+    def extract_path(self, meet=None):
+        """
+        Join the forward tree (start .. meet[0]) with the backward tree
+        (meet[1] .. goal) and refresh COST along the joined path.
+        """
+        left, right = meet
+        path = []
+        s = left
+        while s != self.s_start:
+            path.append(s)
+            s = self.PARENT[s]
+        path.append(self.s_start)
+        path.reverse()
+
+        s = right
+        if s != left:
+            self.PARENT[s] = left
+            path.append(s)
+        while s != self.s_goal:
+            s_next = self.PARENT_B[s]
+            self.PARENT[s_next] = s
+            path.append(s_next)
+            s = s_next
+
+        cost = 0
+        self.COST[self.s_start] = 0
+        for a, b in zip(path, path[1:]):
+            cost += round(self.NEIGHBOR_COSTS[a][b], 2)
+            self.COST[b] = cost
+        return path
+
+
+class BidirectionalAStarAgent(BidirectionalUCSAgent):
+    """
+    Bidirectional A* with the balanced potential (h_goal - h_start) / 2,
+    which keeps both frontiers consistent with one shared stopping rule.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+
+    def searching(self):
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)  # rebuilt if the map was edited
+        self.to_goal = self.heuristic.toward(self.s_goal)
+        self.from_start = self.heuristic.away_from(self.s_start)
+        return super().searching()
+
+    def potential(self, s):
+        return (self.to_goal(s) - self.from_start(s)) / 2
+
+    def get_h(self, s_from, s_to):
+        return self.heuristic.estimate(s_from, s_to)
@@ -0,0 +1,225 @@
+import heapq
+import math
+
+from agent import AbstractSearchAgent
+from heuristics import teleport_heuristic
+
+
+class LPAStarAgent(AbstractSearchAgent):
+    """
+    Lifelong Planning A* (the fixed-start form of D* Lite).
+
+    The first `searching()` call is a normal A*-like search. After that the
+    agent keeps its g/rhs values and open list; edits to the map, whether
+    made through `set_obstacle`/`add_teleport`/`remove_teleport`, reported
+    with `update_cells`, or made straight on `Env.obs`/`Env.teleports`
+    (e.g. by `Generator.toggle_obstacle`), only mark the cells around the
+    edit inconsistent, and the next `searching()` repairs the old
+    shortest-path tree from there instead of starting over.
+
+    `touched` is the number of vertex expansions of the last search or
+    repair, and `repairs` keeps one such count per call.
+
+    The Env holds the agent's listener weakly, so a dropped agent stops
+    listening once collected; `close()`, or leaving a `with` block, stops
+    it right away.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.g = {}
+        self.rhs = {self.s_start: 0}
+        self.open = []
+        self.open_keys = {}
+        self.pending = set()
+        self.known_teleports = dict(self.teleports)
+        self.teleport_sources = self.reverse_teleports()
+        self.rekey = False
+        self.touched = 0
+        self.repairs = []
+        self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+        self.h_goal = self.heuristic.toward(self.s_goal)
+
+        self.push(self.s_start)
+        self.Env.add_listener(self.update_cells, weak=True)
+
+    def close(self):
+        """Stop listening to map edits."""
+        self.Env.remove_listener(self.update_cells)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- map edits ---------------------------------------------------------
+
+    def set_obstacle(self, s, blocked=True):
+        if (s in self.obs) != blocked:
+            self.Env.set_obstacle(s, blocked)
+
+    def add_teleport(self, a, b):
+        self.teleports[a] = b
+        self.teleports[b] = a
+
+    def remove_teleport(self, a):
+        b = self.teleports.pop(a)
+        if self.teleports.get(b) == a:
+            self.teleports.pop(b)
+
+    def update_cells(self, changed):
+        """Record edited cells; they are repaired on the next `searching()`."""
+        for s in changed:
+            self.pending.add(s)
+            old_exit = self.known_teleports.get(s)
+            new_exit = self.teleports.get(s)
+            if old_exit != new_exit:
+                self.rekey = True
+                for exit_cell in (old_exit, new_exit):
+                    if exit_cell is not None:
+                        self.pending.add(exit_cell)
+                if new_exit is None:
+                    self.known_teleports.pop(s, None)
+                else:
+                    self.known_teleports[s] = new_exit
+            if s in self.teleports or s in self.teleport_sources:
+                self.rekey = True  # teleport endpoints feed the heuristic
+
+    # --- LPA* core ---------------------------------------------------------
+
+    def get_h(self, s):
+        return self.h_goal(s)
+
+    def key(self, s):
+        k = min(self.g.get(s, math.inf), self.rhs.get(s, math.inf))
+        return (k + self.get_h(s), k)
+
+    def push(self, s):
+        k = self.key(s)
+        self.open_keys[s] = k
+        self.heappush(self.open, (k, s))
+
+    def top_key(self):
+        while self.open:
+            k, s = self.open[0]
+            if self.open_keys.get(s) == k:
+                return k
+            self.heappop(self.open)
+            if self.stats is not None:
+                self.stats.stale_pops += 1
+        return (math.inf, math.inf)
+
+    def successors(self, s):
+        if s not in self.NEIGHBOR_COSTS:
+            return {}
+        return self.NEIGHBOR_COSTS[s]
+
+    def predecessors(self, s):
+        preds = [u for u in self.get_neighbors(s) if u in self.NEIGHBOR_COSTS and s in self.NEIGHBOR_COSTS[u]]
+        for u in self.teleport_sources.get(s, ()):
+            if u not in preds and u in self.NEIGHBOR_COSTS and s in self.NEIGHBOR_COSTS[u]:
+                preds.append(u)
+        return preds
+
+    def update_vertex(self, s):
+        if s != self.s_start:
+            best = math.inf
+            for u in self.predecessors(s):
+                g_u = self.g.get(u, math.inf)
+                if g_u < math.inf:
+                    best = min(best, g_u + round(self.NEIGHBOR_COSTS[u][s], 2))
+            if best == math.inf:
+                self.rhs.pop(s, None)
+            else:
+                self.rhs[s] = best
+        self.open_keys.pop(s, None)
+        if self.g.get(s, math.inf) != self.rhs.get(s, math.inf):
+            self.push(s)
+
+    def apply_pending(self):
+        self.teleport_sources = self.reverse_teleports()
+        if self.rekey:
+            self.heuristic = teleport_heuristic(self.Env, self.euclidean_cost)
+            self.h_goal = self.heuristic.toward(self.s_goal)
+        affected = set()
+        for s in self.pending:
+            affected.add(s)
+            for dx, dy in self.u_set:
+                affected.add((s[0] + dx, s[1] + dy))
+            affected.update(self.teleport_sources.get(s, ()))
+        self.pending.clear()
+
+        for s in affected:
+            if 0 <= s[0] < self.Env.x_range and 0 <= s[1] < self.Env.y_range:
+                if s in self.obs:
+                    self.g.pop(s, None)
+                self.update_vertex(s)
+
+        if self.rekey:
+            # The heuristic moved with the teleports: re-key the open list.
+            self.open = [(self.key(s), s) for s in self.open_keys]
+            self.open_keys = {s: k for k, s in self.open}
+            heapq.heapify(self.open)
+            self.rekey = False
+
+    def compute_shortest_path(self):
+        seened = []
+        goal = self.s_goal
+        stats = self.stats
+        while self.top_key() < self.key(goal) or self.rhs.get(goal, math.inf) != self.g.get(goal, math.inf):
+            if not self.open:
+                break
+            k, s = self.heappop(self.open)
+            if self.open_keys.get(s) != k:
+                if stats is not None:
+                    stats.stale_pops += 1
+                continue
+            del self.open_keys[s]
+            seened.append(s)
+            if stats is not None:
+                stats.expand(s, len(self.open))
+            g_s = self.g.get(s, math.inf)
+            rhs_s = self.rhs.get(s, math.inf)
+            if g_s > rhs_s:
+                self.g[s] = rhs_s
+                for s_next in self.successors(s):
+                    self.update_vertex(s_next)
+            else:
+                self.g.pop(s, None)
+                self.update_vertex(s)
+                for s_next in self.successors(s):
+                    self.update_vertex(s_next)
+        return seened
+
+    def searching(self):
+        self.apply_pending()
+        seened = self.compute_shortest_path()
+        self.touched = len(seened)
+        self.repairs.append(self.touched)
+        self.VISITED = set(seened)
+        return self.extract_path(), seened
+
+    def extract_path(self):
+        """
+        Walk back from the goal through the predecessor that gives its rhs,
+        filling PARENT and COST along the way.
+        """
+        if self.g.get(self.s_goal, math.inf) == math.inf:
+            raise KeyError(self.s_goal)
+        self.PARENT = {self.s_start: self.s_start}
+        self.COST = {self.s_start: 0}
+        path = [self.s_goal]
+        s = self.s_goal
+        while s != self.s_start:
+            best, parent = math.inf, None
+            for u in self.predecessors(s):
+                cost = self.g.get(u, math.inf) + round(self.NEIGHBOR_COSTS[u][s], 2)
+                if cost < best:
+                    best, parent = cost, u
+            self.PARENT[s] = parent
+            self.COST[s] = self.g[s]
+            path.append(parent)
+            s = parent
+        path.reverse()
+        return path
@@ -0,0 +1,246 @@
+import hashlib
+import heapq
+import json
+import math
+import os
+
+import numpy as np
+
+from adjacency import teleport_cost_lower_bound
+from env import maps_path
+from implemented_agents import AStarAgent
+
+DEFAULT_LANDMARKS = 8
+
+# Tables are stored as float32; this relative slack keeps the heuristic
+# below the float64 distance it was rounded from.
+FLOAT32_SLACK = 1e-6
+
+_loaded = {}
+
+
+def map_fingerprint(environment, euclidean_cost):
+    """
+    Hash of everything the landmark distances depend on: the grid, the
+    cost mode and the teleport pairs (not their drawn costs, which the
+    relaxed graph replaces with lower bounds).
+    """
+    h = hashlib.sha1()
+    h.update(f"{environment.x_range}x{environment.y_range}:{bool(euclidean_cost)}".encode())
+    h.update(bytes(environment.grid))
+    h.update(repr(sorted(environment.teleports.items())).encode())
+    return h.hexdigest()
+
+
+def relaxed_graph(environment, euclidean_cost):
+    """
+    The map's CSR arrays plus teleport edges where every teleport costs its
+    lower bound and is usable in both directions. Distances in this graph
+    never exceed the real ones, whatever teleport noise an Env instance drew.
+
+    Returns (row_start, row_end, neighbors, costs, teleports): the arrays as
+    memoryviews, which read back Python scalars quickly without a list per
+    row, and the teleport edges as {flat index: [(flat index, cost), ...]}.
+    """
+    arrays = environment.adjacency(euclidean_cost).arrays()
+    row_start = memoryview(arrays["row_start"])
+    row_end = memoryview(arrays["row_end"])
+    neighbors = memoryview(arrays["neighbors"])
+    costs = memoryview(arrays["costs"].astype(np.float64).round(2))
+
+    teleports = {}
+    for a, b in environment.teleports.items():
+        ia, ib = environment.to_index(a), environment.to_index(b)
+        c = teleport_cost_lower_bound(a, b, euclidean_cost)
+        for u, v in ((ia, ib), (ib, ia)):
+            if not environment.cells[u]:
+                teleports.setdefault(u, []).append((v, c))
+    return row_start, row_end, neighbors, costs, teleports
+
+
+def dijkstra(graph, source):
+    """Distances from `source` over a `relaxed_graph`; inf where unreachable."""
+    row_start, row_end, neighbors, costs, teleports = graph
+    dist = [math.inf] * len(row_start)
+    dist[source] = 0.0
+    que = [(0.0, source)]
+    while que:
+        d, u = heapq.heappop(que)
+        if d > dist[u]:
+            continue
+        for j in range(row_start[u], row_end[u]):
+            v = neighbors[j]
+            nd = d + costs[j]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(que, (nd, v))
+        for v, c in teleports.get(u, ()):
+            nd = d + c
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(que, (nd, v))
+    return np.array(dist, dtype=np.float64)
+
+
+def build_landmarks(environment, num_landmarks=DEFAULT_LANDMARKS, euclidean_cost=True):
+    """
+    Pick landmarks by farthest-point selection and return
+    (landmark cells, (n_cells, K) float32 distance table).
+    """
+    graph = relaxed_graph(environment, euclidean_cost)
+    free = np.flatnonzero(environment.grid.ravel() == 0)
+    if len(free) == 0:
+        return [], np.zeros((environment.n_cells, 0), dtype=np.float32)
+
+    # Start from the free cell farthest from the first one, then keep adding
+    # the cell farthest from every landmark chosen so far.
+    nearest = dijkstra(graph, int(free[0]))
+    landmarks = []
+    columns = []
+    for _ in range(min(num_landmarks, len(free))):
+        candidates = nearest[free]
+        pick = int(free[np.argmax(candidates)])
+        if landmarks and nearest[pick] == 0:
+            break
+        dist = dijkstra(graph, pick)
+        landmarks.append(environment.to_cell(pick))
+        columns.append(dist)
+        nearest = dist if len(landmarks) == 1 else np.minimum(nearest, dist)
+
+    table = np.stack(columns, axis=1).astype(np.float32)
+    return landmarks, table
+
+
+def table_paths(environment, euclidean_cost, directory=maps_path, fingerprint=None):
+    """
+    Table and sidecar paths, named by fingerprint so that Envs of one map
+    with different teleports keep separate tables.
+    """
+    mode = "euclidean" if euclidean_cost else "unit"
+    if fingerprint is None:
+        fingerprint = map_fingerprint(environment, euclidean_cost)
+    stem = os.path.join(directory, f"{environment.map_name}.alt-{mode}-{fingerprint[:16]}")
+    return stem + ".npy", stem + ".json"
+
+
+def prune_tables(environment, euclidean_cost, keep, directory=maps_path):
+    """
+    Delete the saved tables of this map and cost mode other than the paths
+    in `keep`. Random or edited teleports give every Env a new fingerprint,
+    so only the latest table is kept rather than one per layout ever seen.
+    """
+    prefix = os.path.basename(table_paths(environment, euclidean_cost, directory, "")[0])[:-len(".npy")]
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(prefix) and name.endswith((".npy", ".json")) and path not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already pruned, or still mapped where that blocks removal
+
+
+def _replace(path, write):
+    """
+    Write `path` through a temporary file and swap it in, so readers (and
+    memory maps) of the old file never see a partial or rewritten one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_landmarks(environment, num_landmarks=DEFAULT_LANDMARKS, euclidean_cost=True, directory=maps_path):
+    """
+    Landmark table for the map, memory-mapped from next to the map file.
+    The table is (re)built and saved when missing, built for a different
+    map content or cost mode, or built with fewer landmarks; saving one
+    prunes the tables of the map's older fingerprints.
+    """
+    fingerprint = map_fingerprint(environment, euclidean_cost)
+    if environment.map_name is None:
+        return build_landmarks(environment, num_landmarks, euclidean_cost)
+
+    table_path, meta_path = table_paths(environment, euclidean_cost, directory, fingerprint)
+    key = (table_path, fingerprint)
+    if key in _loaded and _loaded[key][1].shape[1] >= num_landmarks:
+        return _loaded[key]
+
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        if meta["fingerprint"] != fingerprint or len(meta["landmarks"]) < num_landmarks:
+            raise ValueError("stale landmark table")
+        table = np.load(table_path, mmap_mode='r')
+        if table.shape != (environment.n_cells, len(meta["landmarks"])):
+            raise ValueError("landmark table does not match its sidecar")
+        landmarks = [tuple(s) for s in meta["landmarks"]]
+    except (FileNotFoundError, ValueError, KeyError):
+        landmarks, table = build_landmarks(environment, num_landmarks, euclidean_cost)
+        # The sidecar goes last: a reader that finds it finds its table.
+        _replace(table_path, lambda f: np.save(f, table))
+        meta = {
+            "fingerprint": fingerprint,
+            "euclidean_cost": bool(euclidean_cost),
+            "landmarks": [list(s) for s in landmarks],
+        }
+        _replace(meta_path, lambda f: f.write(json.dumps(meta).encode()))
+        print(f"Landmark table saved to {table_path}.")
+        prune_tables(environment, euclidean_cost, (table_path, meta_path), directory)
+        table = np.load(table_path, mmap_mode='r')
+
+    _loaded[key] = (landmarks, table)
+    return landmarks, table
+
+
+class ALTAgent(AStarAgent):
+    """
+    A* with the ALT heuristic: max over landmarks L of |d(L, goal) - d(L, s)|.
+
+    The landmark distances are computed with every teleport at its lowest
+    possible cost, so the heuristic stays admissible (and consistent) with
+    teleports in play.
+    """
+
+    def __init__(self, s_start, s_goal, environment, euclidean_cost=True, num_landmarks=DEFAULT_LANDMARKS):
+        super().__init__(s_start, s_goal, environment, euclidean_cost)
+        self.landmarks, self.table = load_landmarks(environment, num_landmarks, euclidean_cost)
+        self.table = self.table[:, :num_landmarks]
+        self.rows = {}  # cell -> its table row as floats, read from the map once
+
+    def row(self, s):
+        row = self.rows.get(s)
+        if row is None:
+            row = self.rows[s] = self.table[self.Env.to_index(s)].astype(np.float64).tolist()
+        return row
+
+    def goal_bound(self):
+        goal = self.s_goal
+        memo = {}
+
+        def h(s):
+            value = memo.get(s)
+            if value is None:
+                value = memo[s] = self.get_h(s, goal)
+            return value
+
+        return h
+
+    def get_h(self, s_from, s_to):
+        h = 0.0
+        scale = 0.0
+        for t, r in zip(self.row(s_to), self.row(s_from)):
+            diff = abs(t - r)
+            if diff != diff:
+                continue  # nan: both cells unreachable from that landmark
+            if diff > h:
+                h = diff
+            if max(t, r) > scale:
+                scale = max(t, r)
+        if h == math.inf:
+            return h
+        return max(0.0, h - FLOAT32_SLACK * scale)
@@ -11,6 +11,9 @@ def main():
     use_random_teleports = False  # Change to True to use random teleports
     num_pairs = 2  # Number of random teleport gates if enabled
     FPS = 200  # Frames per second for animation
+    headless = False  # True to render offscreen and write `output` instead of opening a window
+    output = "search.png"  # .png (final frame), .gif (animated) or a directory of frames
+    every = 1  # Headless animations keep every k-th expansion as a frame
 
     start = (5, 25)  # Start position
     goal = (45, 25)  # Goal position
@@ -26,7 +29,7 @@ def main():
     run_time = end_time - start_time
     print(f"Search completed in {run_time:.5f} seconds")
 
-    plot = Plotting(start, goal, environment, FPS)
+    plot = Plotting(start, goal, environment, FPS, headless, output, every)
     plot.animation(path, visited, agent.COST)
 
 
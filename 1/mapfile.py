@@ -0,0 +1,101 @@
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+EXTENSION = '.bmap'
+MAGIC = b'GMAP'
+FORMAT_VERSION = 1
+
+# magic, format version, reserved, x_range, y_range, number of teleport pairs
+HEADER = struct.Struct('<4sHHIII')
+
+
+def write_map(file_path, x_range, y_range, cells, teleport_pairs):
+    """
+    Write a binary map: the header, the obstacle plane packed one bit per
+    cell (flat index x * y_range + y, little bit order) and an int32
+    table of teleport pairs (ax, ay, bx, by).
+    """
+    plane = np.packbits(np.frombuffer(cells, dtype=np.uint8, count=x_range * y_range) != 0, bitorder='little')
+    table = np.asarray(teleport_pairs, dtype='<i4').reshape(-1, 4)
+    with open(file_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, x_range, y_range, len(table)))
+        f.write(plane.tobytes())
+        f.write(table.tobytes())
+
+
+def read_map(file_path):
+    """
+    Map data of a binary map in the shape `Env` reads from JSON, except that
+    the obstacles come as a ready one-byte-per-cell "cells" buffer.
+    """
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, _, x_range, y_range, n_pairs = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{file_path} is not a binary map")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{file_path} has map format version {version}, expected {FORMAT_VERSION}")
+
+        n_cells = x_range * y_range
+        plane_size = (n_cells + 7) // 8
+        plane = np.frombuffer(mm, dtype=np.uint8, count=plane_size, offset=HEADER.size)
+        cells = bytearray(n_cells)
+        np.frombuffer(cells, dtype=np.uint8)[:] = np.unpackbits(plane, count=n_cells, bitorder='little')
+        table = np.frombuffer(mm, dtype='<i4', count=4 * n_pairs, offset=HEADER.size + plane_size)
+        teleports = [[[ax, ay], [bx, by]] for ax, ay, bx, by in table.reshape(-1, 4).tolist()]
+        del plane, table  # release the views before the mapping closes
+
+    return {"x_range": x_range, "y_range": y_range, "cells": cells, "teleports": teleports}
+
+
+def teleport_pairs(teleports):
+    """Each bidirectional teleport once, as (ax, ay, bx, by)."""
+    return [a + b for a, b in teleports.items() if teleports.get(b) != a or a < b]
+
+
+def convert(json_path, binary_path=None):
+    """Convert a JSON map to the binary format next to it."""
+    from env import DEFAULT_X_RANGE, DEFAULT_Y_RANGE  # env imports this module
+
+    if binary_path is None:
+        binary_path = os.path.splitext(json_path)[0] + EXTENSION
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+
+    x_range = data.get("x_range", DEFAULT_X_RANGE)
+    y_range = data.get("y_range", DEFAULT_Y_RANGE)
+    grid = np.zeros((x_range, y_range), dtype=np.uint8)
+    if data.get("obstacles"):
+        pts = np.asarray(data["obstacles"], dtype=np.int64).reshape(-1, 2)
+        inside = (pts[:, 0] >= 0) & (pts[:, 0] < x_range) & (pts[:, 1] >= 0) & (pts[:, 1] < y_range)
+        grid[pts[inside, 0], pts[inside, 1]] = 1
+    pairs = [list(pair[0]) + list(pair[1]) for pair in data.get("teleports", []) if len(pair) == 2]
+
+    write_map(binary_path, x_range, y_range, grid.tobytes(), pairs)
+    print(f"Map converted to {binary_path}.")
+    return binary_path
+
+
+def main():
+    from env import maps_path
+
+    parser = argparse.ArgumentParser(description="Convert JSON maps to the binary map format.")
+    parser.add_argument("maps", nargs="*", help="map names in the Maps folder (default: all of them)")
+    args = parser.parse_args()
+
+    # Skip sidecar files such as the landmark tables' <map>.alt-<mode>.json.
+    names = args.maps or [
+        name for name in (os.path.basename(p)[:-5] for p in sorted(glob.glob(os.path.join(maps_path, "*.json"))))
+        if '.' not in name
+    ]
+    for name in names:
+        convert(os.path.join(maps_path, name + ".json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import collections
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 64 << 20
+
+# Estimated memory of one cached entry and of each cell on a cached path
+# (measured with tracemalloc); a cell costs mostly its slot in the
+# per-cell index that answers subpath queries, not the path array.
+ENTRY_BYTES = 384
+CELL_BYTES = 288
+
+
+class _Entry:
+    __slots__ = ("key", "cells", "nbytes")
+
+    def __init__(self, key, cells, nbytes):
+        self.key = key  # (euclidean_cost, start, goal)
+        self.cells = cells  # flat indices of the path, None if unreachable
+        self.nbytes = nbytes
+
+
+class PathCache:
+    """
+    LRU cache of search results on one Env, keyed by cost mode and
+    endpoints under the map version the cache has seen, within a budget
+    of `max_bytes` (estimated from ENTRY_BYTES and CELL_BYTES).
+
+    Paths are only correct to reuse from agents that return optimal paths
+    (UCS, A*, the bidirectional and memory-bounded agents, ...); every
+    agent searching through one cache should be one of those. Because a
+    subpath of an optimal path is optimal, a query from cell a to a later
+    cell b of any cached path is answered from it without a search.
+
+    Map edits are handled as they happen. Blocking a cell or removing a
+    teleport only removes edges, so just the entries whose path crosses
+    that cell are dropped; freeing a cell or adding or moving a teleport
+    can make any path shorter, so everything is dropped. Results that the
+    goal is unreachable survive edits that only remove edges.
+
+    `hits` counts exact and subpath answers (`subpath_hits` the latter),
+    `misses` searches run, `evictions` entries dropped for space and
+    `invalidations` entries dropped by map edits.
+
+    The Env only holds the cache weakly; `close()`, or leaving a `with`
+    block, stops it listening before it is collected.
+    """
+
+    def __init__(self, environment, max_bytes=DEFAULT_MAX_BYTES):
+        self.env = environment
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.by_cell = {False: {}, True: {}}  # cost mode -> flat index -> {entry: position}
+        self.nbytes = 0
+        self.version = environment.version
+        self.known_teleports = dict(environment.teleports)
+
+        self.hits = 0
+        self.subpath_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        environment.add_listener(self.on_map_change, weak=True)
+
+    def close(self):
+        """Stop listening to map edits."""
+        self.env.remove_listener(self.on_map_change)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # --- lookups -----------------------------------------------------------
+
+    def searching(self, agent):
+        """
+        `agent.searching()` through the cache. On a hit the agent's PARENT
+        and COST are filled along the path and nothing is expanded, so the
+        visited list is empty; a cached unreachable goal raises KeyError
+        like the search would.
+        """
+        if agent.Env is not self.env:
+            raise ValueError("the agent searches a different Env than this cache")
+        key = (agent.euclidean_cost, agent.s_start, agent.s_goal)
+        path = self.lookup(*key)
+        if path is not None:
+            return self.fill(agent, path), []
+
+        self.misses += 1
+        try:
+            path, visited = agent.searching()
+        except KeyError:
+            self.store(key, None)
+            raise
+        self.store(key, path)
+        return path, visited
+
+    def lookup(self, euclidean_cost, start, goal):
+        """
+        Cached path from start to goal, or None on a miss; raises KeyError
+        if the goal is cached as unreachable.
+        """
+        if self.version != self.env.version:
+            # Edited while the cache was not listening.
+            self.clear()
+            self.version = self.env.version
+
+        entry = self.entries.get((euclidean_cost, start, goal))
+        if entry is not None:
+            self.entries.move_to_end(entry.key)
+            self.hits += 1
+            if entry.cells is None:
+                raise KeyError(goal)
+            return self.to_path(entry.cells)
+
+        index = self.by_cell[euclidean_cost]
+        at_start = index.get(self.env.to_index(start))
+        at_goal = index.get(self.env.to_index(goal))
+        if not at_start or not at_goal:
+            return None
+        if len(at_start) > len(at_goal):
+            candidates = ((entry, at_start.get(entry), j) for entry, j in at_goal.items())
+        else:
+            candidates = ((entry, i, at_goal.get(entry)) for entry, i in at_start.items())
+        for entry, i, j in candidates:
+            if i is not None and j is not None and i <= j:
+                self.entries.move_to_end(entry.key)
+                self.hits += 1
+                self.subpath_hits += 1
+                return self.to_path(entry.cells[i:j + 1])
+        return None
+
+    def to_path(self, cells):
+        return [self.env.to_cell(idx) for idx in cells.tolist()]
+
+    @staticmethod
+    def fill(agent, path):
+        return agent.fill_path(path)
+
+    # --- storage -----------------------------------------------------------
+
+    def store(self, key, path):
+        """Cache the path for key (None: unreachable), evicting as needed."""
+        old = self.entries.get(key)
+        if old is not None:
+            self.drop(old)
+        if path is None:
+            cells = None
+            nbytes = ENTRY_BYTES
+        else:
+            cells = np.fromiter((self.env.to_index(s) for s in path), dtype=np.int64, count=len(path))
+            nbytes = ENTRY_BYTES + CELL_BYTES * len(path)
+        if nbytes > self.max_bytes:
+            return
+
+        entry = _Entry(key, cells, nbytes)
+        self.entries[key] = entry
+        self.nbytes += nbytes
+        if cells is not None:
+            index = self.by_cell[key[0]]
+            for position, idx in enumerate(cells.tolist()):
+                index.setdefault(idx, {})[entry] = position
+
+        while self.nbytes > self.max_bytes:
+            self.drop(next(iter(self.entries.values())))
+            self.evictions += 1
+
+    def drop(self, entry):
+        del self.entries[entry.key]
+        self.nbytes -= entry.nbytes
+        if entry.cells is not None:
+            index = self.by_cell[entry.key[0]]
+            for idx in entry.cells.tolist():
+                at_cell = index[idx]
+                del at_cell[entry]
+                if not at_cell:
+                    del index[idx]
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        for index in self.by_cell.values():
+            index.clear()
+        self.nbytes = 0
+
+    # --- map edits ---------------------------------------------------------
+
+    def on_map_change(self, changed):
+        """Drop the entries the edited cells can make wrong."""
+        env = self.env
+        if all(self.removes_edges(s) for s in changed):
+            doomed = set()
+            for s in changed:
+                idx = env.to_index(s)
+                for index in self.by_cell.values():
+                    doomed.update(index.get(idx, ()))
+            for entry in doomed:
+                self.drop(entry)
+            self.invalidations += len(doomed)
+        else:
+            self.clear()
+        self.known_teleports = dict(env.teleports)
+        self.version = env.version
+
+    def removes_edges(self, s):
+        """True if the edit at s can only have taken edges out of the graph."""
+        exit_cell = self.env.teleports.get(s)
+        if exit_cell != self.known_teleports.get(s):
+            return exit_cell is None  # a removed teleport, not a new or moved one
+        return s in self.env.obs
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "subpath_hits": self.subpath_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
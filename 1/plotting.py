@@ -1,24 +1,50 @@
 import math
+import os
 import random
 
+import numpy as np
 import pygame
 
+from viewport import Viewport
+
+# The path is revealed over at most this many exported frames.
+PATH_FRAMES = 20
+
+BACKGROUND = (245, 245, 245)
+
 
 class Plotting:
-    def __init__(self, xI, xG, environment, FPS=60):
+    def __init__(self, xI, xG, environment, FPS=60, headless=False, output=None, every=1, cell_size=None):
+        """
+        With `headless=True` nothing is shown: rendering goes to an offscreen
+        surface (SDL dummy driver) and `animation` writes `output` instead,
+        see `export`. `every` visited cells are revealed per frame.
+
+        `cell_size` is the starting zoom in pixels per cell; by default 20,
+        or less so that large maps fit the window. Small zooms switch to an
+        image-based level of detail, see `Viewport`.
+        """
         self.FPS = FPS
         self.xI, self.xG = xI, xG
+        self.headless = headless
+        self.output = output
+        self.every = every
 
         self.env = environment
         self.obs = self.env.obs
         self.teleports = self.env.teleports
 
         self.banner_height = 40
+        self.view = Viewport(self.env.x_range, self.env.y_range, cell_size, top=self.banner_height)
+        self.map_rect = pygame.Rect(0, self.banner_height, self.view.width, self.view.height)
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
         pygame.init()
-        self.screen = pygame.display.set_mode(
-            (self.env.x_range * 20, self.env.y_range * 20 + self.banner_height)
-        )
-        pygame.display.set_caption("Robot Path Planning")
+        if headless:
+            self.screen = pygame.Surface(self.view.size)
+        else:
+            self.screen = pygame.display.set_mode(self.view.size)
+            pygame.display.set_caption("Robot Path Planning")
         self.clock = pygame.time.Clock()
         self.font = pygame.font.SysFont("Arial", 24)
 
@@ -37,32 +63,152 @@ class Plotting:
             for _ in range(len(self.teleport_pairs))
         ]
 
-    def draw_grid(self):
+        # Pre-rendered effect sprites, keyed by color, pulse radius and size.
+        self.teleport_sprites = {}
+        self.glow_sprites = {}
+        self.static_layer = None
+        self.visited_drawn = 0
+        self.rgb = None
+
+    def static_rgb(self):
+        """Background, obstacles and teleport cells as one RGB pixel per cell."""
+        rgb = np.empty((self.env.x_range, self.env.y_range, 3), dtype=np.uint8)
+        rgb[:] = BACKGROUND
+        rgb[self.env.grid != 0] = 0
+        for (a, b), color in zip(self.teleport_pairs, self.teleport_colors):
+            rgb[a] = color
+            rgb[b] = color
+        return rgb
+
+    def build_layers(self, visited=None):
+        """
+        Render the parts of a frame that do not animate once for the current
+        view: the static layer (banner, background, obstacles, start/goal
+        glows) and the visited canvas, a copy of it that visited cells are
+        added to. Visited cells already shown are drawn again from `visited`.
+        """
+        self.static_layer = pygame.Surface(self.screen.get_size())
+        screen, self.screen = self.screen, self.static_layer
         pygame.draw.rect(
             self.screen, (255, 255, 255),
-            (0, 0, self.env.x_range * 20, self.banner_height)
+            (0, 0, self.view.width, self.banner_height)
         )
-        self.screen.fill(
-            (245, 245, 245),
-            (0, self.banner_height, self.env.x_range * 20, self.env.y_range * 20)
-        )
-        self.draw_obstacles()
-        self.draw_teleports(pygame.time.get_ticks() // 50)  # Pass frame count for animation
+        self.screen.fill(BACKGROUND, self.map_rect)
+        self.screen.set_clip(self.map_rect)
+        if self.view.lod:
+            self.rgb = self.static_rgb()
+            self.view.blit_image(self.screen, self.rgb)
+        else:
+            self.rgb = None
+            self.draw_obstacles()
         self.draw_glow(self.xI, (0, 0, 255))
         self.draw_glow(self.xG, (0, 255, 0))
+        self.screen.set_clip(None)
+        self.screen = screen
+        self.static_version = self.env.version
+
+        self.canvas = self.static_layer.copy()
+        drawn, self.visited_drawn = self.visited_drawn, 0
+        if visited is not None:
+            self.reveal_visited(visited, drawn)
+
+    def reveal_visited(self, visited, stop):
+        """
+        Draw visited[visited_drawn:stop] onto the visited canvas, colored by
+        their place in the whole search, and return the rects touched.
+        """
+        start = self.visited_drawn
+        self.visited_drawn = max(start, stop)
+        if start >= stop:
+            return []
+        length = len(visited)
+
+        if self.view.lod:
+            cells = np.array(visited[start:stop], dtype=np.int64).reshape(-1, 2)
+            index = np.arange(start, stop)
+            self.rgb[cells[:, 0], cells[:, 1]] = 200
+            self.rgb[cells[:, 0], cells[:, 1], 0] = 200 - 200 * index // length
+            self.canvas.set_clip(self.map_rect)
+            rects = self.view.blit_cells(self.canvas, self.rgb, cells)
+            glows = [self.glow_rect(self.xI), self.glow_rect(self.xG)]
+            if any(glow.collidelist(rects) >= 0 for glow in glows):
+                # A redrawn tile cut into a glow: draw both again on clean cells.
+                for glow in glows:
+                    rects.append(self.view.blit_image(self.canvas, self.rgb, self.view.region(glow)))
+                screen, self.screen = self.screen, self.canvas
+                self.draw_glow(self.xI, (0, 0, 255))
+                self.draw_glow(self.xG, (0, 255, 0))
+                self.screen = screen
+            self.canvas.set_clip(None)
+            return [rect for rect in rects if rect is not None]
+
+        x_lo, x_hi, y_lo, y_hi = self.view.visible()
+        radius = self.view.scale(8)
+        rects = []
+        self.canvas.set_clip(self.map_rect)
+        for index in range(start, stop):
+            pos = visited[index]
+            if not (x_lo <= pos[0] < x_hi and y_lo <= pos[1] < y_hi):
+                continue
+            gradient = (200 - int(200 * index / length), 200, 200)
+            rects.append(pygame.draw.circle(self.canvas, gradient, self.view.center(pos), radius))
+        self.canvas.set_clip(None)
+        return rects
 
     def draw_obstacles(self):
-        for (ox, oy) in self.obs:
-            pygame.draw.rect(
-                self.screen, (0, 0, 0),
-                (ox * 20, oy * 20 + self.banner_height, 20, 20)
-            )
+        x_lo, x_hi, y_lo, y_hi = self.view.visible()
+        xs, ys = np.nonzero(self.env.grid[x_lo:x_hi, y_lo:y_hi])
+        size = math.ceil(self.view.cell_size)
+        for ox, oy in zip((xs + x_lo).tolist(), (ys + y_lo).tolist()):
+            left, top = self.view.to_screen((ox, oy))
+            pygame.draw.rect(self.screen, (0, 0, 0), (int(left), int(top), size, size))
 
     def draw_teleports(self, frame):
+        if self.view.lod:
+            return []  # Part of the map image at this zoom
+        rects = []
         for i, (a, b) in enumerate(self.teleport_pairs):
             color = self.teleport_colors[i]
-            self.draw_teleport_circle(a, color, frame)
-            self.draw_teleport_circle(b, color, frame)
+            for pos in (a, b):
+                if self.view.is_visible(pos):
+                    rects.append(self.draw_teleport_circle(pos, color, frame))
+        return rects
+
+    def teleport_sprite(self, color, pulse_radius):
+        """
+        Glow, main circle, inner vortex and warp ring of a teleport, rendered
+        once per color and pulse radius and scaled to the current zoom.
+        """
+        size = max(1, round(self.view.scale(34)))
+        key = (color, pulse_radius, size)
+        sprite = self.teleport_sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((34, 34), pygame.SRCALPHA)
+
+            # --- PULSATING GLOW EFFECT ---
+            glow_surf = pygame.Surface((30, 30), pygame.SRCALPHA)
+            pygame.draw.circle(glow_surf, (*color, 100), (15, 15), pulse_radius)
+            sprite.blit(glow_surf, (2, 2))
+
+            # --- MAIN TELEPORT CIRCLE ---
+            pygame.draw.circle(sprite, color, (17, 17), 8)
+
+            # --- INNER VORTEX EFFECT ---
+            for radius in range(6, 1, -2):
+                alpha = 120 - (radius * 20)
+                vortex_surf = pygame.Surface((16, 16), pygame.SRCALPHA)
+                pygame.draw.circle(vortex_surf, (*color, alpha), (8, 8), radius)
+                sprite.blit(vortex_surf, (9, 9))
+
+            # --- WARPING EFFECT (Subtle Distortion Ring) ---
+            warp_surf = pygame.Surface((34, 34), pygame.SRCALPHA)
+            pygame.draw.circle(warp_surf, (*color, 60), (17, 17), 17, 2)
+            sprite.blit(warp_surf, (0, 0))
+
+            if size != 34:
+                sprite = pygame.transform.smoothscale(sprite, (size, size))
+            self.teleport_sprites[key] = sprite
+        return sprite
 
     def draw_teleport_circle(self, pos, color, frame=0):
         """
@@ -71,80 +217,87 @@ class Plotting:
           - Rotating particle effect
           - Inner vortex effect
           - Subtle warp ring effect
+        The static parts come from a pre-rendered sprite; returns the rect
+        the teleport covers.
         """
 
-        x = pos[0] * 20 + 10
-        y = pos[1] * 20 + 10 + self.banner_height
-
-        # --- PULSATING GLOW EFFECT ---
-        pulse_radius = 12 + 2 * math.sin(frame * 0.1)  # Animate glow pulse
-        glow_surf = pygame.Surface((30, 30), pygame.SRCALPHA)
-        pygame.draw.circle(glow_surf, (*color, 100), (15, 15), int(pulse_radius))
-        self.screen.blit(glow_surf, (x - 15, y - 15))
+        x, y = self.view.center(pos)
 
-        # --- MAIN TELEPORT CIRCLE ---
-        pygame.draw.circle(self.screen, color, (x, y), 8)
+        pulse_radius = int(12 + 2 * math.sin(frame * 0.1))  # Animate glow pulse
+        sprite = self.teleport_sprite(color, pulse_radius)
+        half = sprite.get_width() // 2
+        rect = self.screen.blit(sprite, (x - half, y - half))
 
         # --- ROTATING PARTICLES (ORBITS AROUND TELEPORTER) ---
         num_particles = 6
         angle_offset = frame * 0.1
+        orbit = self.view.scale(14)
+        particle = max(1, round(self.view.scale(2)))
 
         for i in range(num_particles):
             angle = 2 * math.pi * i / num_particles + angle_offset
-            px = int(x + 14 * math.cos(angle))
-            py = int(y + 14 * math.sin(angle))
-            pygame.draw.circle(self.screen, (*color, 180), (px, py), 2)
-
-        # --- INNER VORTEX EFFECT ---
-        for radius in range(6, 1, -2):
-            alpha = 120 - (radius * 20)
-            vortex_surf = pygame.Surface((16, 16), pygame.SRCALPHA)
-            pygame.draw.circle(vortex_surf, (*color, alpha), (8, 8), radius)
-            self.screen.blit(vortex_surf, (x - 8, y - 8))
-
-        # --- WARPING EFFECT (Subtle Distortion Ring) ---
-        warp_surf = pygame.Surface((34, 34), pygame.SRCALPHA)
-        pygame.draw.circle(warp_surf, (*color, 60), (17, 17), 17, 2)
-        self.screen.blit(warp_surf, (x - 17, y - 17))
+            px = int(x + orbit * math.cos(angle))
+            py = int(y + orbit * math.sin(angle))
+            pygame.draw.circle(self.screen, (*color, 180), (px, py), particle)
+        return rect
+
+    def glow_rect(self, pos):
+        size = max(16, round(self.view.scale(40)))
+        x, y = self.view.center(pos)
+        return pygame.Rect(x - size // 2, y - size // 2, size, size)
 
     def draw_glow(self, pos, color):
-        for radius in range(15, 0, -5):
-            alpha = 50 if radius == 15 else 150
-            s = pygame.Surface((40, 40), pygame.SRCALPHA)
-            pygame.draw.circle(s, (*color, alpha), (20, 20), radius)
-            self.screen.blit(s, (pos[0] * 20 - 10, pos[1] * 20 + self.banner_height - 10))
+        rect = self.glow_rect(pos)
+        size = rect.width
+        sprite = self.glow_sprites.get((color, size))
+        if sprite is None:
+            sprite = pygame.Surface((40, 40), pygame.SRCALPHA)
+            for radius in range(15, 0, -5):
+                alpha = 50 if radius == 15 else 150
+                s = pygame.Surface((40, 40), pygame.SRCALPHA)
+                pygame.draw.circle(s, (*color, alpha), (20, 20), radius)
+                sprite.blit(s, (0, 0))
+            if size != 40:
+                sprite = pygame.transform.smoothscale(sprite, (size, size))
+            self.glow_sprites[(color, size)] = sprite
+        return self.screen.blit(sprite, rect.topleft)
 
     def draw_path(self, path, END=False):
         length = len(path)
-        if END:
+        rects = []
+        self.screen.set_clip(self.map_rect)
+        if self.view.lod:
+            # Cells are too small for circles: draw the path as a polyline,
+            # broken where it takes a teleport.
+            run = []
+            for pos in path + [None]:
+                if run and (pos is None or max(abs(pos[0] - run[-1][0]), abs(pos[1] - run[-1][1])) > 1):
+                    points = [self.view.center(s) for s in run]
+                    if len(points) == 1:
+                        points.append(points[0])
+                    rects.append(pygame.draw.lines(self.screen, (255, 50, 50), False, points, 3))
+                    run = []
+                if pos is not None:
+                    run.append(pos)
+        elif END:
+            radius = self.view.scale(10)
             for pos in path:
-                pygame.draw.circle(
-                    self.screen, (255, 50, 50),
-                    (pos[0] * 20 + 10, pos[1] * 20 + 10 + self.banner_height),
-                    10
-                )
+                if self.view.is_visible(pos):
+                    rects.append(pygame.draw.circle(self.screen, (255, 50, 50), self.view.center(pos), radius))
         else:
             for index, pos in enumerate(path):
+                if not self.view.is_visible(pos):
+                    continue
                 size = 10 + (index * 5 // length)
                 color = (255 - (index * 200 // length), 50, 50)
-                pygame.draw.circle(
-                    self.screen, color,
-                    (pos[0] * 20 + 10, pos[1] * 20 + 10 + self.banner_height),
-                    size
-                )
-
-    def draw_visited(self, visited):
-        length = len(visited)
-        for index, pos in enumerate(visited):
-            size = 8
-            gradient = (200 - int(200 * index / length), 200, 200)
-            pygame.draw.circle(
-                self.screen, gradient,
-                (pos[0] * 20 + 10, pos[1] * 20 + 10 + self.banner_height),
-                size
-            )
+                rects.append(pygame.draw.circle(self.screen, color, self.view.center(pos), self.view.scale(size)))
+        self.screen.set_clip(None)
+        return rects
 
     def update_info_display(self, visited_count, path_cost):
+        banner = pygame.Rect(0, 0, self.view.width, self.banner_height)
+        if self.static_layer is not None:
+            self.screen.blit(self.static_layer, banner, banner)
         visited_label = self.font.render("Visited:", True, (0, 0, 0))
         visited_number = self.font.render(str(visited_count), True, (0, 0, 0))
         cost_label = self.font.render("Path Cost:", True, (0, 0, 0))
@@ -153,48 +306,79 @@ class Plotting:
         self.screen.blit(visited_label, (10, 10))
         self.screen.blit(visited_number, (10 + visited_label.get_width() + 5, 10))
 
-        right_x = self.env.x_range * 20 - cost_label.get_width() - cost_number.get_width() - 15
+        right_x = self.view.width - cost_label.get_width() - cost_number.get_width() - 15
         self.screen.blit(cost_label, (right_x, 10))
         self.screen.blit(cost_number, (right_x + cost_label.get_width() + 5, 10))
+        return banner
 
-    def update(self):
-        pygame.display.update()
+    def update(self, rects=None):
+        """Show the frame (only `rects` when given) and keep the frame rate."""
+        pygame.display.update(rects)
         self.clock.tick(self.FPS)
 
     def animation(self, path, visited, cost_dict):
+        """
+        Reveal the visited cells (`every` per frame), then the path. Each
+        frame only redraws what changed: new visited cells go onto the
+        visited canvas, the path, teleport and banner overlays of the last
+        frame are erased by copying the canvas back, and only those rects
+        are pushed to the display. Zooming or panning the view rebuilds the
+        layers once.
+        """
+        if self.headless:
+            self.export(path, visited, cost_dict)
+            return
+
         running = True
         path_index = 0
         visited_index = 0
         frame = 0  # Frame counter for teleport animation
+        overlay = []  # Rects drawn over the canvas in the last frame
+        self.build_layers()
+        self.screen.blit(self.canvas, (0, 0))
+        pygame.display.update()
 
         while running:
+            rebuild = self.env.version != self.static_version  # The map was edited
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                elif self.view.handle_event(event):
+                    rebuild = True
+
+            if rebuild:
+                self.build_layers(visited)
+                self.screen.blit(self.canvas, (0, 0))
+                overlay = [self.screen.get_rect()]
 
-            self.draw_grid()
+            for rect in overlay:
+                self.screen.blit(self.canvas, rect, rect)
+            dirty = overlay
+            overlay = []
 
             # --- Step 1: Reveal visited nodes gradually ---
             if visited_index < len(visited):
-                self.draw_visited(visited[:visited_index])
-                visited_index += 1
+                visited_index = min(len(visited), visited_index + self.every)
+                for rect in self.reveal_visited(visited, visited_index):
+                    self.screen.blit(self.canvas, rect, rect)
+                    dirty.append(rect)
                 pygame.time.delay(5)  # Slow down exploration effect
 
             # --- Step 2: Reveal path gradually ---
             elif path_index < len(path):
-                self.draw_visited(visited)  # Keep visited nodes visible
-                self.draw_path(path[:path_index])
+                overlay += self.draw_path(path[:path_index])
                 path_index += 1
                 pygame.time.delay(30)  # Delay to show path formation
 
             else:
                 # --- Step 3: Show the final path after completion ---
-                self.draw_visited(visited)
-                self.draw_path(path, END=True)
+                overlay += self.draw_path(path, END=True)
                 pygame.time.delay(50)
 
             # Update teleport visuals dynamically
-            self.draw_teleports(frame)
+            self.screen.set_clip(self.map_rect)
+            overlay += self.draw_teleports(frame)
+            self.screen.set_clip(None)
             frame += 1
 
             # Display real-time cost info
@@ -203,7 +387,66 @@ class Plotting:
                 last_node = path[path_index - 1]
                 current_cost = cost_dict.get(last_node, 0.0)
 
-            self.update_info_display(visited_count=visited_index, path_cost=current_cost)
-            self.update()
+            dirty.append(self.update_info_display(visited_count=visited_index, path_cost=current_cost))
+            self.update(dirty + overlay)
+
+        pygame.quit()
+
+    def export(self, path, visited, cost_dict, output=None, every=None):
+        """
+        Render the search offscreen and write it to `output`:
+          - *.png: the final frame only
+          - *.gif: an animated GIF (needs Pillow)
+          - anything else: a directory of frame_00000.png, ... files
+        Animated output samples every k-th expansion (`every`); there are no
+        delays or clock ticks, so long searches export in seconds.
+        """
+        output = output or self.output or "search.png"
+        every = max(1, every or self.every)
+        final_cost = cost_dict.get(path[-1], 0.0) if path else 0.0
+        self.build_layers()
+
+        def render(visited_count, path_count, frame_index):
+            self.reveal_visited(visited, visited_count)
+            self.screen.blit(self.canvas, (0, 0))
+            if path_count:
+                end = path_count == len(path)
+                self.draw_path(path if end else path[:path_count], END=end)
+            self.screen.set_clip(self.map_rect)
+            self.draw_teleports(frame_index)
+            self.screen.set_clip(None)
+            cost = cost_dict.get(path[path_count - 1], 0.0) if path_count else 0.0
+            self.update_info_display(visited_count=visited_count, path_cost=cost)
+            return self.screen
+
+        if output.lower().endswith(".png"):
+            pygame.image.save(render(len(visited), len(path), 0), output)
+            print(f"Search image saved to {output} (path cost {final_cost:.2f}).")
+            pygame.quit()
+            return output
+
+        frames = [(count, 0) for count in range(every, len(visited), every)] + [(len(visited), 0)]
+        path_step = max(1, math.ceil(len(path) / PATH_FRAMES))
+        frames += [(len(visited), count) for count in range(path_step, len(path), path_step)]
+        frames.append((len(visited), len(path)))
+
+        if output.lower().endswith(".gif"):
+            try:
+                from PIL import Image
+            except ImportError:
+                raise ImportError("GIF export needs Pillow; export to a directory of PNG frames instead")
+            images = []
+            for frame_index, (visited_count, path_count) in enumerate(frames):
+                surface = render(visited_count, path_count, frame_index)
+                images.append(Image.frombytes("RGB", surface.get_size(), pygame.image.tobytes(surface, "RGB")))
+            images[0].save(output, save_all=True, append_images=images[1:],
+                           duration=max(20, 1000 // self.FPS), loop=0)
+        else:
+            os.makedirs(output, exist_ok=True)
+            for frame_index, (visited_count, path_count) in enumerate(frames):
+                pygame.image.save(render(visited_count, path_count, frame_index),
+                                  os.path.join(output, f"frame_{frame_index:05d}.png"))
 
+        print(f"{len(frames)} frames saved to {output} (path cost {final_cost:.2f}).")
         pygame.quit()
+        return output
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import mapfile
+from env import maps_path
+
+KINDS = ("random", "maze", "rooms")
+
+DEFAULT_DENSITY = 0.3
+DEFAULT_ROOM_SIZE = (4, 16)
+
+# (dx, dy) of the 8-neighborhood the agents move in.
+MOTIONS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+
+
+def random_field(x_range, y_range, rng, density=DEFAULT_DENSITY):
+    """Obstacles dropped independently on each cell with probability `density`."""
+    return rng.random((x_range, y_range)) < density
+
+
+def spanning_tree(n, u, v, rng):
+    """
+    Minimum spanning tree under random edge weights (a Kruskal maze) of
+    the graph with `n` nodes and edges (u[i], v[i]), built by Boruvka
+    rounds so every step is vectorized. Returns a boolean mask over the
+    edges.
+    """
+    order = rng.permutation(len(u))  # random distinct weights: edge rank
+    tree = np.zeros(len(u), dtype=bool)
+    # Endpoints are rewritten to component ids, which are renumbered to
+    # 0..n-1 after every round so the arrays shrink as components merge.
+    alive = order
+    cu, cv = u[order], v[order]
+    while alive.size:
+        keep = cu != cv
+        alive, cu, cv = alive[keep], cu[keep], cv[keep]
+        if not alive.size:
+            break
+
+        # Cheapest edge out of every component, as a position in `alive`
+        # (which stays in rank order).
+        best = np.full(n, len(alive))
+        at = np.arange(len(alive))
+        np.minimum.at(best, cu, at)
+        np.minimum.at(best, cv, at)
+        roots = np.arange(n)
+        has_edge = best < len(alive)
+        at = best[has_edge]
+        tree[alive[at]] = True
+
+        # Hook each component onto the other end of its edge; with distinct
+        # weights the only cycles are pairs picking the same edge.
+        a, b = cu[at], cv[at]
+        parent = roots.copy()
+        parent[has_edge] = np.where(a == roots[has_edge], b, a)
+        mutual = (parent[parent] == roots) & (roots < parent)
+        parent[mutual] = roots[mutual]
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+        is_root = parent == roots
+        label = np.cumsum(is_root) - 1
+        label = label[parent]
+        n = int(is_root.sum())
+        cu, cv = label[cu], label[cv]
+
+    return tree
+
+
+def maze(x_range, y_range, rng, braid=0.0):
+    """
+    Maze with one-cell corridors on the odd coordinates. A perfect maze has
+    exactly one route between any two cells; `braid` is the fraction of
+    dead ends opened into a neighbor, which adds loops.
+    """
+    w, h = (x_range - 1) // 2, (y_range - 1) // 2
+    grid = np.ones((x_range, y_range), dtype=bool)
+    if w < 1 or h < 1:
+        return grid
+    grid[1:2 * w:2, 1:2 * h:2] = False
+
+    node = np.arange(w * h).reshape(w, h)
+    u = np.concatenate([node[:-1, :].ravel(), node[:, :-1].ravel()])
+    v = np.concatenate([node[1:, :].ravel(), node[:, 1:].ravel()])
+    tree = spanning_tree(w * h, u, v, rng)
+    # The wall between two maze cells sits halfway between them.
+    ux, uy = np.divmod(u[tree], h)
+    vx, vy = np.divmod(v[tree], h)
+    grid[ux + vx + 1, uy + vy + 1] = False
+
+    if braid > 0:
+        braid_dead_ends(grid, w, h, rng, braid)
+    return grid
+
+
+def braid_dead_ends(grid, w, h, rng, braid):
+    """Knock one wall out of a `braid` fraction of the maze's dead ends."""
+    xs, ys = np.meshgrid(np.arange(w) * 2 + 1, np.arange(h) * 2 + 1, indexing='ij')
+    xs, ys = xs.ravel(), ys.ravel()
+    steps = ((-1, 0), (1, 0), (0, -1), (0, 1))
+    walls = np.stack([grid[xs + dx, ys + dy] for dx, dy in steps], axis=1)
+    dead = np.flatnonzero((walls.sum(axis=1) == 3) & (rng.random(len(xs)) < braid))
+    if not dead.size:
+        return
+
+    # A wall can go if there is a maze cell behind it.
+    x, y = xs[dead], ys[dead]
+    candidates = walls[dead].copy()
+    candidates[:, 0] &= x > 1
+    candidates[:, 1] &= x < 2 * w - 1
+    candidates[:, 2] &= y > 1
+    candidates[:, 3] &= y < 2 * h - 1
+    choice = np.argmax(np.where(candidates, rng.random(candidates.shape), -1), axis=1)
+    ok = candidates[np.arange(len(dead)), choice]
+    step = np.array(steps)[choice[ok]]
+    grid[x[ok] + step[:, 0], y[ok] + step[:, 1]] = False
+
+
+def rooms(x_range, y_range, rng, room_size=DEFAULT_ROOM_SIZE, attempts=None, loops=0.1):
+    """
+    Rectangular rooms that do not touch, joined by L-shaped corridors.
+    Rooms are chained in serpentine order so that consecutive ones are
+    close; a `loops` fraction of extra corridors skips one room ahead.
+    """
+    grid = np.ones((x_range, y_range), dtype=bool)
+    lo, hi = room_size
+    if attempts is None:
+        attempts = max(1, x_range * y_range // (hi * hi) * 4)
+    if x_range < lo + 2 or y_range < lo + 2:
+        grid[1:-1, 1:-1] = False
+        return grid
+
+    placed = []
+    sizes = rng.integers(lo, hi + 1, size=(attempts, 2))
+    corners = rng.random((attempts, 2))
+    for (w, h), (fx, fy) in zip(sizes.tolist(), corners.tolist()):
+        w, h = min(w, x_range - 2), min(h, y_range - 2)
+        x0 = 1 + int(fx * (x_range - 1 - w))
+        y0 = 1 + int(fy * (y_range - 1 - h))
+        # Keep a wall between rooms.
+        if not grid[x0 - 1:x0 + w + 1, y0 - 1:y0 + h + 1].all():
+            continue
+        grid[x0:x0 + w, y0:y0 + h] = False
+        placed.append((x0 + w // 2, y0 + h // 2))
+
+    band = 2 * hi
+    placed.sort(key=lambda c: (c[1] // band, c[0] if (c[1] // band) % 2 == 0 else -c[0]))
+    links = list(zip(placed, placed[1:]))
+    extra = rng.random(max(0, len(placed) - 2)) < loops
+    links += [(placed[i], placed[i + 2]) for i in np.flatnonzero(extra).tolist()]
+    for (ax, ay), (bx, by) in links:
+        if rng.random() < 0.5:
+            grid[min(ax, bx):max(ax, bx) + 1, ay] = False
+            grid[bx, min(ay, by):max(ay, by) + 1] = False
+        else:
+            grid[ax, min(ay, by):max(ay, by) + 1] = False
+            grid[min(ax, bx):max(ax, bx) + 1, by] = False
+    return grid
+
+
+def components(free):
+    """
+    Connected-component label of every free cell under 8-neighbor moves
+    (the smallest flat index in the component), -1 for obstacles. Each
+    round a label's owner takes the smallest label next to any cell that
+    carries it, and labels are shortcut by pointer jumping.
+    """
+    x_range, y_range = free.shape
+    n = free.size
+    sentinel = n
+    cells = np.flatnonzero(free)
+    # parent[i] is a cell of i's component with parent[i] <= i.
+    parent = np.append(np.where(free.ravel(), np.arange(n), sentinel), sentinel)
+    padded = np.full((x_range + 2, y_range + 2), sentinel)
+    while True:
+        labels = parent[:n].reshape(free.shape)
+        padded[1:-1, 1:-1] = labels
+        smallest = labels.copy()
+        for dx, dy in MOTIONS:
+            np.minimum(smallest, padded[1 + dx:1 + dx + x_range, 1 + dy:1 + dy + y_range], out=smallest)
+        smallest = smallest.ravel()[cells]
+        if np.array_equal(smallest, parent[cells]):
+            break
+
+        np.minimum.at(parent, parent[cells], smallest)
+        parent[cells] = np.minimum(parent[cells], smallest)
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+    return np.where(free, parent[:n].reshape(free.shape), -1)
+
+
+def make_solvable(grid):
+    """Fill every free pocket outside the largest connected region."""
+    free = ~grid
+    if not free.any():
+        return grid
+    labels = components(free)
+    keep = np.bincount(labels[free]).argmax()
+    grid[free & (labels != keep)] = True
+    return grid
+
+
+def place_teleports(grid, num_pairs, rng, min_distance=0):
+    """
+    Teleport pairs on distinct free cells, as [[ax, ay], [bx, by]] lists.
+    Pairs whose ends are closer than `min_distance` are redrawn.
+    """
+    free = np.flatnonzero(~grid.ravel())
+    y_range = grid.shape[1]
+    pairs = []
+    used = set()
+    for _ in range(100 * num_pairs):
+        if len(pairs) == num_pairs or len(free) - len(used) < 2:
+            break
+        a, b = (divmod(int(i), y_range) for i in rng.choice(free, size=2, replace=False))
+        if a in used or b in used or np.hypot(a[0] - b[0], a[1] - b[1]) < min_distance:
+            continue
+        used.update((a, b))
+        pairs.append([list(a), list(b)])
+    return pairs
+
+
+def generate(kind, x_range, y_range, seed=0, density=DEFAULT_DENSITY, braid=0.0,
+             room_size=DEFAULT_ROOM_SIZE, num_pairs=0, min_distance=0, solvable=False):
+    """
+    Obstacle grid (True = blocked, indexed [x, y]) and teleport pairs of a
+    new map. The same arguments always give the same map. With `solvable`,
+    every free cell can reach every other one; mazes and rooms are
+    connected by construction, random fields get their pockets filled.
+    """
+    rng = np.random.default_rng(seed)
+    if kind == "random":
+        grid = random_field(x_range, y_range, rng, density)
+    elif kind == "maze":
+        grid = maze(x_range, y_range, rng, braid)
+    elif kind == "rooms":
+        grid = rooms(x_range, y_range, rng, room_size)
+    else:
+        raise ValueError(f"Unknown map kind {kind!r}, expected one of {KINDS}")
+    if solvable:
+        make_solvable(grid)
+    return grid, place_teleports(grid, num_pairs, rng, min_distance)
+
+
+def save(file_path, grid, teleports):
+    """Write the map as JSON or, for a .bmap path, as a binary map."""
+    x_range, y_range = grid.shape
+    if file_path.endswith(mapfile.EXTENSION):
+        pairs = [a + b for a, b in teleports]
+        mapfile.write_map(file_path, x_range, y_range, grid.astype(np.uint8).tobytes(), pairs)
+    else:
+        map_data = {
+            "x_range": x_range,
+            "y_range": y_range,
+            "obstacles": np.argwhere(grid).tolist(),
+            "teleports": teleports,
+        }
+        # json.dumps encodes in one C call; json.dump to a file is several
+        # times slower on maps with millions of obstacles.
+        with open(file_path, 'w') as f:
+            f.write(json.dumps(map_data))
+    print(f"Map saved to {file_path}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate seeded procedural maps.")
+    parser.add_argument("name", help="map name; files go to the Maps folder")
+    parser.add_argument("--kind", choices=KINDS, default="maze")
+    parser.add_argument("--size", type=int, nargs="+", default=[51, 31], metavar="N",
+                        help="x_range and y_range (one value for a square map)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, default=DEFAULT_DENSITY, help="obstacle density of random maps")
+    parser.add_argument("--braid", type=float, default=0.0, help="fraction of maze dead ends to open (0 = perfect)")
+    parser.add_argument("--room-size", type=int, nargs=2, default=list(DEFAULT_ROOM_SIZE), metavar=("MIN", "MAX"))
+    parser.add_argument("--teleports", type=int, default=0, help="number of teleport pairs")
+    parser.add_argument("--min-distance", type=float, default=0, help="smallest distance between teleport ends")
+    parser.add_argument("--solvable", action="store_true", help="make every free cell reachable from every other")
+    parser.add_argument("--format", nargs="+", choices=("json", "bmap"), default=["json", "bmap"])
+    args = parser.parse_args(argv)
+
+    x_range, y_range = (args.size * 2)[:2]
+    t0 = time.perf_counter()
+    grid, teleports = generate(args.kind, x_range, y_range, args.seed, args.density, args.braid,
+                               tuple(args.room_size), args.teleports, args.min_distance, args.solvable)
+    print(f"Generated {args.kind} map of {x_range}x{y_range} in {time.perf_counter() - t0:.2f}s "
+          f"({grid.mean():.1%} obstacles, {len(teleports)} teleport pairs).")
+
+    # JSON first: Env prefers the binary map when it is at least as new.
+    for extension in (".json", mapfile.EXTENSION):
+        if extension.lstrip('.') in args.format:
+            save(os.path.join(maps_path, args.name + extension), grid, teleports)
+
+
+if __name__ == "__main__":
+    main()
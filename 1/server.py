@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import collections
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import mapfile
+from benchmark import agent_classes
+from env import Env, maps_path
+
+DEFAULT_PORT = 8765
+DEFAULT_AGENT = "AStarAgent"
+
+# Latencies kept for the percentiles.
+LATENCY_WINDOW = 10000
+
+# Agents a request may name, by class name.
+AGENTS = {cls.__name__: cls for cls in agent_classes()}
+
+# Envs kept per process before the least recently used is dropped.
+MAX_ENVS = 8
+
+_envs = collections.OrderedDict()
+_envs_lock = threading.Lock()  # the server loads Envs in threads
+
+
+def map_version(map_name):
+    """
+    Version of a map on disk: the mtimes of its JSON and binary files
+    (None where missing), or None if it has neither.
+    """
+    mtimes = []
+    for extension in (".json", mapfile.EXTENSION):
+        try:
+            mtimes.append(os.path.getmtime(os.path.join(maps_path, map_name + extension)))
+        except OSError:
+            mtimes.append(None)
+    return None if mtimes == [None, None] else tuple(mtimes)
+
+
+def cached_env(map_name, version):
+    """Env of a map version if this process has it loaded, else None."""
+    key = (map_name, version)
+    with _envs_lock:
+        environment = _envs.get(key)
+        if environment is not None:
+            _envs.move_to_end(key)
+        return environment
+
+
+def load_env(map_name, version, teleport_costs=None):
+    """
+    Env of a map version, loaded once per process and kept with the
+    adjacency and heuristic tables agents build on it. `teleport_costs`
+    ({euclidean_cost: {(a, b): cost}}) pins the drawn teleport costs, so
+    every process answers on the same graph.
+    """
+    environment = cached_env(map_name, version)
+    if environment is not None:
+        return environment
+    environment = Env(map_name, use_random_teleports=False)
+    if teleport_costs is None:
+        teleport_costs = {}
+        for euclidean_cost in (False, True):
+            cache = environment.adjacency(euclidean_cost)
+            for a, b in sorted(environment.teleports.items()):
+                cache.teleport_cost(a, b)
+            teleport_costs[euclidean_cost] = dict(cache.teleport_costs)
+    for euclidean_cost, costs in teleport_costs.items():
+        environment.adjacency(euclidean_cost).teleport_costs.update(costs)
+    with _envs_lock:
+        for stale in [k for k in _envs if k[0] == map_name]:
+            del _envs[stale]
+        _envs[(map_name, version)] = environment
+        if len(_envs) > MAX_ENVS:
+            _envs.popitem(last=False)
+    return environment
+
+
+def teleport_costs_of(environment):
+    return {ec: dict(environment.adjacency(ec).teleport_costs) for ec in (False, True)}
+
+
+def plan(map_name, version, teleport_costs, agent_name, start, goal, euclidean_cost):
+    """Run one query in a pool process; returns the response fields."""
+    environment = load_env(map_name, version, teleport_costs)
+    agent = AGENTS[agent_name](start, goal, environment, euclidean_cost)
+    t0 = time.perf_counter()
+    try:
+        path, visited = agent.searching()
+        cost = agent.COST[goal]
+    except KeyError:
+        path, visited, cost = None, agent.VISITED, None
+    return {
+        "path": [list(s) for s in path] if path is not None else None,
+        "cost": round(cost, 6) if cost is not None else None,
+        "expansions": len(visited),
+        "search_time": time.perf_counter() - t0,
+    }
+
+
+class PathServer:
+    """
+    Long-running path planning server speaking JSON lines.
+
+    A request is one JSON object per line:
+
+        {"id": 1, "map": "test", "start": [x, y], "goal": [x, y],
+         "agent": "AStarAgent", "euclidean_cost": true}
+
+    and is answered, in completion order, by a line with the same "id" and
+    "path", "cost" (null if unreachable), "expansions", "latency" and
+    "coalesced", or by {"id", "error"}. {"op": "stats"} returns counters
+    and latency percentiles in milliseconds.
+
+    Searches run in a process pool; each process keeps the Envs it has
+    loaded, keyed by map name and file mtimes, so edited maps are reloaded
+    and everything else is reused. The server's own Envs load in a thread,
+    one load per map version however many requests wait for it. Identical
+    queries in flight at the same time share one search.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pool = None
+        self.in_flight = {}
+        self.loading = {}
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.counters = collections.Counter()
+
+    def start_pool(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, unix_path=None):
+        """Serve until cancelled, on a Unix socket if `unix_path` is given."""
+        self.start_pool()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            if unix_path:
+                server = await asyncio.start_unix_server(self.handle, path=unix_path)
+                where = unix_path
+            else:
+                server = await asyncio.start_server(self.handle, host, port)
+                where = f"{host}:{port}"
+            print(f"Path server listening on {where} with {self.max_workers} workers.")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+            if unix_path and os.path.exists(unix_path):
+                os.unlink(unix_path)
+
+    async def handle(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def respond(self, line, writer):
+        t0 = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+            request_id = request.get("id")
+            if request.get("op") == "stats":
+                response = self.stats()
+            else:
+                response = await self.query(request)
+                response["latency"] = time.perf_counter() - t0
+                self.latencies.append(response["latency"])
+        except Exception as e:
+            # Bad requests, and searches that fail in the pool (a broken
+            # pool, a recursion limit hit), are answered rather than left to
+            # end the connection.
+            self.counters["errors"] += 1
+            if isinstance(e, KeyError):
+                message = f"missing field {e}"
+            elif isinstance(e, (ValueError, TypeError)):
+                message = str(e)
+            else:
+                message = f"{type(e).__name__}: {e}"
+            response = {"error": message}
+        response["id"] = request_id
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+
+    async def query(self, request):
+        map_name = request["map"]
+        version = map_version(map_name)
+        if version is None:
+            raise ValueError(f"unknown map {map_name!r}")
+        agent_name = request.get("agent", DEFAULT_AGENT)
+        if agent_name not in AGENTS:
+            raise ValueError(f"unknown agent {agent_name!r}")
+        start, goal = tuple(request["start"]), tuple(request["goal"])
+        euclidean_cost = bool(request.get("euclidean_cost", True))
+        for s in (start, goal):
+            if len(s) != 2 or not all(isinstance(v, int) and not isinstance(v, bool) for v in s):
+                raise ValueError(f"cell {list(s)} is not [x, y]")
+
+        # The server's own copy of the Env validates queries and fixes the
+        # teleport costs that the pool processes are given.
+        environment = await self.environment(map_name, version)
+        for s in (start, goal):
+            if not (0 <= s[0] < environment.x_range and 0 <= s[1] < environment.y_range):
+                raise ValueError(f"cell {list(s)} is outside the map")
+            if s in environment.obs:
+                raise ValueError(f"cell {list(s)} is an obstacle")
+
+        self.counters["requests"] += 1
+        key = (map_name, version, agent_name, start, goal, euclidean_cost)
+        future = self.in_flight.get(key)
+        coalesced = future is not None
+        if coalesced:
+            self.counters["coalesced"] += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self.pool, plan, map_name, version, teleport_costs_of(environment),
+                agent_name, start, goal, euclidean_cost,
+            )
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        response = dict(await asyncio.shield(future))
+        response["coalesced"] = coalesced
+        return response
+
+    async def environment(self, map_name, version):
+        """
+        The server's Env of a map version. A first load runs in a thread so
+        it does not stall the event loop, and requests arriving meanwhile
+        wait on that same load.
+        """
+        environment = cached_env(map_name, version)
+        if environment is not None:
+            return environment
+        key = (map_name, version)
+        future = self.loading.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(None, load_env, map_name, version)
+            self.loading[key] = future
+            future.add_done_callback(lambda _: self.loading.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        percentiles = {}
+        if len(latencies):
+            for p in (50, 90, 99, 99.9):
+                percentiles[f"p{p:g}_ms"] = round(float(np.percentile(latencies, p)), 3)
+        return {
+            "requests": self.counters["requests"],
+            "coalesced": self.counters["coalesced"],
+            "errors": self.counters["errors"],
+            "in_flight": len(self.in_flight),
+            "cached_envs": len(_envs),
+            "workers": self.max_workers,
+            **percentiles,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve path queries as JSON lines.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, help="search processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    server = PathServer(args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from env import Env
+
+
+def share_array(array):
+    """Copy an array into a new shared memory block; return (block, spec)."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def attach_array(spec):
+    """Map the block of a `share_array` spec; return (block, array view)."""
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def share_map(environment, euclidean_cost, blocks):
+    """
+    Put the occupancy grid and the fully built adjacency arrays of one cost
+    mode in shared memory; returns (map_spec, adjacency_specs) for
+    `attach_map`. The blocks created are appended to `blocks`, which the
+    caller closes and unlinks when the workers are done.
+    """
+    cache = environment.adjacency(euclidean_cost)
+    shm, grid_spec = share_array(environment.grid)
+    blocks.append(shm)
+    adjacency_specs = {"arrays": {}, "teleport_costs": cache.teleport_costs}
+    for key, array in cache.arrays().items():
+        shm, adjacency_specs["arrays"][key] = share_array(array)
+        blocks.append(shm)
+    map_spec = (grid_spec, environment.x_range, environment.y_range,
+                dict(environment.teleports), environment.map_name)
+    return map_spec, adjacency_specs
+
+
+def attach_map(map_spec, adjacency_specs, euclidean_cost, blocks):
+    """
+    Env over a map shared by `share_map`, with its adjacency loaded from
+    the shared arrays. The blocks mapped are appended to `blocks`, which
+    must stay referenced as long as the Env is used.
+    """
+    grid_spec, x_range, y_range, teleports, map_name = map_spec
+    shm, _ = attach_array(grid_spec)
+    blocks.append(shm)
+    environment = Env.from_buffer(shm.buf, x_range, y_range, teleports, map_name)
+    arrays = {}
+    for key, spec in adjacency_specs["arrays"].items():
+        shm, arrays[key] = attach_array(spec)
+        blocks.append(shm)
+    environment.adjacency(euclidean_cost).load_arrays(arrays, adjacency_specs["teleport_costs"])
+    return environment
@@ -0,0 +1,60 @@
+import heapq
+import math
+
+import pytest
+
+from env import Env
+from implemented_agents import BidirectionalAStarAgent, BidirectionalUCSAgent, BiIDDFSAgent
+
+ENTRANCE, EXIT = (30, 10), (4, 5)
+QUERIES = [((23, 18), (7, 25)), ((47, 29), (1, 27)), ((42, 14), (29, 24)), ((47, 6), (36, 13))]
+
+
+@pytest.fixture(scope="module")
+def environment():
+    """testAStar1 with a teleport pair whose exit is blocked after loading."""
+    env = Env("testAStar1", use_random_teleports=False)
+    env.teleports.update({ENTRANCE: EXIT, EXIT: ENTRANCE})
+    env.obs.add(EXIT)
+    return env
+
+
+def shortest_cost(agent, unit=False):
+    """Plain Dijkstra over the agent's successor edges (move count if unit)."""
+    dist = {agent.s_start: 0}
+    que = [(0, agent.s_start)]
+    while que:
+        g, s = heapq.heappop(que)
+        if s == agent.s_goal:
+            return g
+        if g > dist[s]:
+            continue
+        for s_next in agent.successors(s):
+            g_next = g + (1 if unit else round(agent.NEIGHBOR_COSTS[s][s_next], 2))
+            if g_next < dist.get(s_next, math.inf):
+                dist[s_next] = g_next
+                heapq.heappush(que, (g_next, s_next))
+    return math.inf
+
+
+def assert_valid(agent, path):
+    assert path[0] == agent.s_start and path[-1] == agent.s_goal
+    for a, b in zip(path, path[1:]):
+        assert b in agent.successors(a)
+
+
+@pytest.mark.parametrize("agent_class", [BidirectionalUCSAgent, BidirectionalAStarAgent])
+@pytest.mark.parametrize("s_start, s_goal", QUERIES)
+def test_bidirectional_matches_dijkstra(environment, agent_class, s_start, s_goal):
+    agent = agent_class(s_start, s_goal, environment)
+    path, _ = agent.searching()
+    assert_valid(agent, path)
+    assert agent.COST[s_goal] == pytest.approx(shortest_cost(agent))
+
+
+@pytest.mark.parametrize("s_start, s_goal", QUERIES)
+def test_biiddfs_fewest_moves(environment, s_start, s_goal):
+    agent = BiIDDFSAgent(s_start, s_goal, environment)
+    path, _ = agent.searching()
+    assert_valid(agent, path)
+    assert len(path) - 1 == shortest_cost(agent, unit=True)
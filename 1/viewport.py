@@ -0,0 +1,163 @@
+import math
+
+import numpy as np
+import pygame
+
+DEFAULT_CELL_SIZE = 20
+MAX_CELL_SIZE = 64
+
+# Largest window (map area) opened for a map; bigger maps start zoomed out.
+MAX_WINDOW = (1280, 800)
+
+# Below this many pixels per cell, maps are drawn as a scaled image
+# instead of per-cell rects and circles.
+LOD_CELL_SIZE = 6
+
+# Side in cells of the tiles `blit_cells` redraws.
+LOD_TILE = 32
+
+
+class Viewport:
+    """
+    Scrollable, zoomable window onto a map.
+
+    `cell_size` is the zoom in pixels per cell and (x0, y0) the map cell at
+    the top-left corner of the map area, which starts `top` pixels below
+    the top of the window. Mouse wheel or +/- zoom around the cursor,
+    right or middle drag and the arrow keys pan, 0 zooms out to fit.
+    """
+
+    def __init__(self, x_range, y_range, cell_size=None, max_size=MAX_WINDOW, top=0):
+        self.x_range, self.y_range = x_range, y_range
+        self.top = top
+        self.fit = min(max_size[0] / x_range, max_size[1] / y_range)
+        self.min_cell_size = min(self.fit, DEFAULT_CELL_SIZE)
+        self.cell_size = cell_size or self.min_cell_size
+        self.width = min(max_size[0], math.ceil(x_range * self.cell_size))
+        self.height = min(max_size[1], math.ceil(y_range * self.cell_size))
+        self.x0 = self.y0 = 0.0
+
+    @property
+    def size(self):
+        """Window size, map area plus the band above it."""
+        return self.width, self.height + self.top
+
+    @property
+    def lod(self):
+        return self.cell_size < LOD_CELL_SIZE
+
+    def to_screen(self, s):
+        """Pixel position of the top-left corner of cell s."""
+        return (s[0] - self.x0) * self.cell_size, (s[1] - self.y0) * self.cell_size + self.top
+
+    def center(self, s):
+        """Pixel position of the center of cell s."""
+        half = self.cell_size / 2
+        return int((s[0] - self.x0) * self.cell_size + half), int((s[1] - self.y0) * self.cell_size + self.top + half)
+
+    def to_cell(self, pos):
+        """Map cell under a pixel position."""
+        return (int(math.floor(pos[0] / self.cell_size + self.x0)),
+                int(math.floor((pos[1] - self.top) / self.cell_size + self.y0)))
+
+    def scale(self, length):
+        """A length given for 20-pixel cells at the current zoom."""
+        return length * self.cell_size / DEFAULT_CELL_SIZE
+
+    def visible(self):
+        """(x_lo, x_hi, y_lo, y_hi) half-open cell ranges on screen."""
+        x_lo, y_lo = int(self.x0), int(self.y0)
+        x_hi = min(self.x_range, math.ceil(self.x0 + self.width / self.cell_size))
+        y_hi = min(self.y_range, math.ceil(self.y0 + self.height / self.cell_size))
+        return x_lo, x_hi, y_lo, y_hi
+
+    def is_visible(self, s):
+        x_lo, x_hi, y_lo, y_hi = self.visible()
+        return x_lo <= s[0] < x_hi and y_lo <= s[1] < y_hi
+
+    def clamp(self):
+        self.x0 = min(max(0.0, self.x0), max(0.0, self.x_range - self.width / self.cell_size))
+        self.y0 = min(max(0.0, self.y0), max(0.0, self.y_range - self.height / self.cell_size))
+
+    def zoom(self, factor, anchor=None):
+        """Zoom by `factor`, keeping the map point under `anchor` (pixels) in place."""
+        if anchor is None:
+            anchor = (self.width / 2, self.top + self.height / 2)
+        cell_size = min(MAX_CELL_SIZE, max(self.min_cell_size, self.cell_size * factor))
+        ax = anchor[0] / self.cell_size + self.x0
+        ay = (anchor[1] - self.top) / self.cell_size + self.y0
+        self.cell_size = cell_size
+        self.x0 = ax - anchor[0] / cell_size
+        self.y0 = ay - (anchor[1] - self.top) / cell_size
+        self.clamp()
+
+    def pan(self, dx, dy):
+        """Move the view by (dx, dy) pixels."""
+        self.x0 += dx / self.cell_size
+        self.y0 += dy / self.cell_size
+        self.clamp()
+
+    def handle_event(self, event):
+        """Apply a pygame zoom/pan event; True if the view changed."""
+        before = (self.cell_size, self.x0, self.y0)
+        if event.type == pygame.MOUSEWHEEL:
+            self.zoom(1.25 ** event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEMOTION and (event.buttons[1] or event.buttons[2]):
+            self.pan(-event.rel[0], -event.rel[1])
+        elif event.type == pygame.KEYDOWN:
+            step = max(self.width, self.height) / 10
+            if event.key == pygame.K_LEFT:
+                self.pan(-step, 0)
+            elif event.key == pygame.K_RIGHT:
+                self.pan(step, 0)
+            elif event.key == pygame.K_UP:
+                self.pan(0, -step)
+            elif event.key == pygame.K_DOWN:
+                self.pan(0, step)
+            elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom(1.25)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom(0.8)
+            elif event.key == pygame.K_0:
+                self.zoom(0)
+        return (self.cell_size, self.x0, self.y0) != before
+
+    def region(self, rect):
+        """(x_lo, x_hi, y_lo, y_hi) cell ranges covering a screen rect."""
+        x_lo, y_lo = self.to_cell(rect.topleft)
+        x_hi, y_hi = self.to_cell(rect.bottomright)
+        return x_lo, x_hi + 1, y_lo, y_hi + 1
+
+    def blit_image(self, surface, rgb, region=None):
+        """
+        Blit the visible part of an (x_range, y_range, 3) uint8 array, one
+        pixel per cell, scaled to the current zoom; `region` (x_lo, x_hi,
+        y_lo, y_hi) limits it to those cells. Returns the rect drawn, or
+        None if nothing was visible.
+        """
+        x_lo, x_hi, y_lo, y_hi = self.visible()
+        if region is not None:
+            x_lo, x_hi = max(x_lo, region[0]), min(x_hi, region[1])
+            y_lo, y_hi = max(y_lo, region[2]), min(y_hi, region[3])
+        if x_lo >= x_hi or y_lo >= y_hi:
+            return None
+        image = pygame.surfarray.make_surface(rgb[x_lo:x_hi, y_lo:y_hi])
+        left, top = self.to_screen((x_lo, y_lo))
+        right, bottom = self.to_screen((x_hi, y_hi))
+        size = (max(1, round(right) - round(left)), max(1, round(bottom) - round(top)))
+        return surface.blit(pygame.transform.scale(image, size), (round(left), round(top)))
+
+    def blit_cells(self, surface, rgb, cells):
+        """
+        Redraw from `rgb` only the LOD_TILE-sized tiles holding `cells`
+        (pairs of x, y), so a few changed cells do not rescale the whole
+        image. Returns the rects drawn.
+        """
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        rects = []
+        for tx, ty in np.unique(cells // LOD_TILE, axis=0).tolist():
+            x, y = tx * LOD_TILE, ty * LOD_TILE
+            rect = self.blit_image(surface, rgb, (x, x + LOD_TILE, y, y + LOD_TILE))
+            if rect is not None:
+                rects.append(rect)
+        return rects